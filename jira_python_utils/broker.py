@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""Local broker that keeps authenticated Jira sessions warm for the console scripts.
+
+The broker listens on a Unix domain socket and runs Jira operations on behalf
+of the console scripts, so that each invocation does not have to instantiate
+its own JIRA client.  When no broker is listening, the operations are run
+in-process exactly as before.
+
+Only the Jira operations are brokered.  Keeping a warm Confluence session
+is out of scope: the reports that publish to Confluence already share one
+session across all of their pages within a run.
+"""
+import click
+import json
+import logging
+import os
+import pathlib
+import socket
+import socketserver
+import stat
+import sys
+
+from typing import Any, Callable, Dict, Optional
+
+from .console_helper import print_red, print_yellow
+from . import constants
+
+
+DEFAULT_SOCKET_PATH = os.path.join(
+    os.getenv("HOME"),
+    ".jira",
+    "broker.sock"
+)
+
+DEFAULT_TIMEOUT = 120
+
+DEFAULT_OUTDIR = os.path.join(
+    constants.DEFAULT_OUTDIR_BASE,
+    os.path.splitext(os.path.basename(__file__))[0],
+    constants.DEFAULT_TIMESTAMP
+)
+
+
+def _add_comment(auth_jira, issue: str, comment: str) -> Dict[str, Any]:
+    auth_jira.add_comment(issue, comment)
+    return {}
+
+
+def _add_component(auth_jira, issue: str, component: str) -> Dict[str, Any]:
+    i = auth_jira.issue(issue, fields='components')
+    if i is None:
+        raise Exception(f"Could not retrieve issue object for issue '{issue}'")
+
+    i.fields.components.append({'name': component})
+    i.update(fields={'components': i.fields.components})
+    return {}
+
+
+def _add_labels(auth_jira, issue: str, labels: list) -> Dict[str, Any]:
+    from .helper import add_labels
+
+    add_labels(auth_jira, issue, labels)
+    return {}
+
+
+def _assign_issue(auth_jira, issue: str, assignee: str) -> Dict[str, Any]:
+    auth_jira.assign_issue(issue, assignee)
+    return {}
+
+
+def _get_issue_details(auth_jira, issue: str) -> Dict[str, Any]:
+    jira_issue = auth_jira.issue(issue, fields='summary,description,issuetype,assignee,priority,status')
+    return {
+        'summary': jira_issue.fields.summary,
+        'description': jira_issue.fields.description,
+        'issue_type': jira_issue.fields.issuetype.name,
+        'assignee': jira_issue.fields.assignee.name,
+        'priority': jira_issue.fields.priority.name,
+        'status': jira_issue.fields.status.name,
+    }
+
+
+def _link_issues(auth_jira, child_issue: str, parent_issue: str, link_type: str) -> Dict[str, Any]:
+    auth_jira.create_issue_link(
+        type=link_type,
+        inwardIssue=child_issue,
+        outwardIssue=parent_issue,
+        comment={
+            "body": f"Linking {child_issue} to {parent_issue}"
+        }
+    )
+    return {}
+
+
+def _remove_watcher(auth_jira, issue: str, username: str) -> Dict[str, Any]:
+    auth_jira.remove_watcher(issue, username)
+    return {}
+
+
+OPERATIONS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    'add_comment': _add_comment,
+    'add_component': _add_component,
+    'add_labels': _add_labels,
+    'assign_issue': _assign_issue,
+    'get_issue_details': _get_issue_details,
+    'link_issues': _link_issues,
+    'remove_watcher': _remove_watcher,
+}
+
+
+def submit(
+    command: str,
+    url: str,
+    credential_file: str,
+    socket_path: str = DEFAULT_SOCKET_PATH,
+    **kwargs) -> Optional[Dict[str, Any]]:
+    """Submit the command to the broker.
+
+    Args:
+        command (str): The name of the operation e.g.: 'add_comment'.
+        url (str): The REST URL.
+        credential_file (str): The credential file.
+        socket_path (str): The broker's Unix domain socket.
+
+    Raises:
+        Exception: If the broker ran the command and it failed, or it received the command and did not reply.
+
+    Returns:
+        Optional[Dict[str, Any]]: The result or None if no broker is listening.
+    """
+    if not os.path.exists(socket_path):
+        return None
+
+    request = {
+        'command': command,
+        'url': url,
+        'credential_file': os.path.abspath(credential_file),
+        'kwargs': kwargs,
+    }
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(DEFAULT_TIMEOUT)
+    try:
+        sock.connect(socket_path)
+    except OSError as e:
+        sock.close()
+        logging.info(f"Could not reach the broker at '{socket_path}' so will run '{command}' in-process: {e}")
+        return None
+
+    # Once the request is sent the broker may have run it, so there is no
+    # in-process fallback: running a non-idempotent command twice is worse.
+    with sock:
+        try:
+            sock.sendall(json.dumps(request).encode('utf-8') + b"\n")
+            line = sock.makefile('rb').readline()
+        except OSError as e:
+            raise Exception(f"The broker at '{socket_path}' did not reply to '{command}' - it may or may not have run: {e}")
+
+    if not line:
+        raise Exception(f"The broker at '{socket_path}' closed the connection without replying to '{command}' - it may or may not have run")
+
+    reply = json.loads(line)
+    if reply['status'] != 'ok':
+        raise Exception(f"The broker could not run '{command}': {reply['error']}")
+
+    logging.info(f"The broker ran '{command}'")
+    return reply['result']
+
+
+def run(command: str, url: str, credential_file: str, **kwargs) -> Dict[str, Any]:
+    """Run the command through the broker if one is listening, otherwise in-process.
+
+    Args:
+        command (str): The name of the operation e.g.: 'add_comment'.
+        url (str): The REST URL.
+        credential_file (str): The credential file.
+
+    Returns:
+        Dict[str, Any]: The result of the operation.
+    """
+    result = submit(command, url, credential_file, **kwargs)
+    if result is None:
+        from .helper import get_auth
+
+        result = OPERATIONS[command](get_auth(credential_file, url), **kwargs)
+    return result
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Run one newline-delimited JSON request against the warm JIRA client."""
+
+    def handle(self):
+        from .helper import get_auth
+
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            if request['command'] not in OPERATIONS:
+                raise Exception(f"Unsupported command '{request['command']}'")
+            operation = OPERATIONS[request['command']]
+            auth_jira = get_auth(request['credential_file'], request['url'])
+            result = operation(auth_jira, **request['kwargs'])
+        except Exception as e:
+            logging.exception(f"Encountered some exception while running request '{line}'")
+            reply = {'status': 'error', 'error': str(e)}
+        else:
+            logging.info(f"Ran command '{request['command']}' with {request['kwargs']=}")
+            reply = {'status': 'ok', 'result': result}
+
+        self.wfile.write(json.dumps(reply).encode('utf-8') + b"\n")
+
+
+class Broker(socketserver.ThreadingUnixStreamServer):
+    """Unix domain socket server that handles each request on its own thread."""
+
+    daemon_threads = True
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+        raise Exception(f"'{socket_path}' exists and is not a socket")
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        # Nothing is listening, e.g.: the previous broker was killed.
+        os.remove(socket_path)
+        logging.info(f"Removed stale socket '{socket_path}'")
+        return
+    finally:
+        probe.close()
+
+    raise Exception(f"A broker is already listening on '{socket_path}'")
+
+
+def serve(socket_path: str = DEFAULT_SOCKET_PATH) -> None:
+    """Serve requests on the Unix domain socket until interrupted.
+
+    Args:
+        socket_path (str): The Unix domain socket the broker will listen on.
+
+    Raises:
+        Exception: If another broker is already listening on the socket.
+    """
+    if os.path.exists(socket_path):
+        _remove_stale_socket(socket_path)
+
+    pathlib.Path(os.path.dirname(socket_path)).mkdir(parents=True, exist_ok=True)
+
+    # The socket is created owner-only, so that no other user can connect
+    # between the bind and a later chmod.
+    umask = os.umask(0o077)
+    try:
+        server = Broker(socket_path, RequestHandler)
+    finally:
+        os.umask(umask)
+
+    with server:
+        logging.info(f"Broker is listening on '{socket_path}'")
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+            logging.info(f"Removed socket '{socket_path}'")
+
+
+@click.command()
+@click.option('--logfile', help="The log file")
+@click.option('--outdir', help=f"The output directory - default is '{DEFAULT_OUTDIR}'")
+@click.option('--socket_path', help=f"The Unix domain socket to listen on - default is '{DEFAULT_SOCKET_PATH}'")
+def main(logfile: str, outdir: str, socket_path: str):
+    """Start the local broker that keeps authenticated Jira sessions warm.
+
+    Args:
+        logfile (str): The log file.
+        outdir (str): The output directory.
+        socket_path (str): The Unix domain socket to listen on.
+    """
+    if outdir is None:
+        outdir = DEFAULT_OUTDIR
+        print_yellow(f"--outdir was not specified and therefore was set to '{outdir}'")
+
+    if not os.path.exists(outdir):
+        pathlib.Path(outdir).mkdir(parents=True, exist_ok=True)
+        print_yellow(f"Created output directory '{outdir}'")
+
+    if logfile is None:
+        logfile = os.path.join(
+            outdir,
+            os.path.splitext(os.path.basename(__file__))[0] + '.log'
+        )
+        print_yellow(f"--logfile was not specified and therefore was set to '{logfile}'")
+
+    if socket_path is None:
+        socket_path = DEFAULT_SOCKET_PATH
+        print_yellow(f"--socket_path was not specified and therefore was set to '{socket_path}'")
+
+    logging.basicConfig(
+        filename=logfile,
+        format=constants.LOGGING_FORMAT,
+        level=constants.LOG_LEVEL
+    )
+
+    print(f"Broker is listening on '{socket_path}' - press Ctrl-C to stop")
+
+    try:
+        serve(socket_path)
+    except KeyboardInterrupt:
+        print("Broker was stopped")
+        sys.exit(0)
+    except Exception as e:
+        print_red(f"Could not start the broker: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
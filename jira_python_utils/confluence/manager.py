@@ -1,16 +1,69 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import json
 import logging
 import os
-from typing import Dict, List, Tuple, Union
+import pathlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import requests
+from requests.adapters import HTTPAdapter
 from rich import print as rprint
+from urllib.parse import urlparse
+from urllib3.util.retry import Retry
+
+from .table_renderer import get_part_number, get_part_title
 
 DEFAULT_VERBOSE = False
 
 DEFAULT_CONTENT_TYPE = 'page'
 
+# Connections kept open to the Confluence server per Manager.
+DEFAULT_POOL_MAXSIZE = 10
+
+# Seconds to wait for the Confluence server to connect and to respond.
+DEFAULT_TIMEOUT = 60
+
+# Retries on connection errors and on 429 or 5xx responses to GET and PUT.
+DEFAULT_MAX_RETRIES = 3
+
+# Seconds between retries are backoff_factor * 2 ** (retry - 1).
+DEFAULT_BACKOFF_FACTOR = 0.5
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Child pages to request per page of the parent page's listing.
+DEFAULT_CHILD_PAGE_LIMIT = 100
+
+# Pages published at the same time by publish_pages.
+DEFAULT_MAX_WORKERS = 4
+
+# Pages in flight at the same time to one Confluence host across all Managers.
+DEFAULT_MAX_PAGES_PER_HOST = 4
+
+# Page ID, version and hash of the last storage body published per (space, title).
+DEFAULT_PAGE_CACHE_FILE = os.path.join(
+    os.getenv("HOME"),
+    '.confluence',
+    'page_cache.json'
+)
+
+# Managers in different threads may publish at the same time.
+_page_cache_lock = threading.Lock()
+
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def _get_host_semaphore(host: str, max_pages_per_host: int) -> threading.BoundedSemaphore:
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(max_pages_per_host)
+        return _host_semaphores[host]
+
 
 class Manager:
     """Class for working with Confluence REST API."""
@@ -37,6 +90,24 @@ class Manager:
         if self.space_key is None:
             self._derive_space_key()
 
+        self.page_cache_file = kwargs.get('page_cache_file', None)
+        if self.page_cache_file is None:
+            self.page_cache_file = DEFAULT_PAGE_CACHE_FILE
+
+        self.timeout = kwargs.get('timeout', DEFAULT_TIMEOUT)
+        self.max_pages_per_host = kwargs.get('max_pages_per_host', DEFAULT_MAX_PAGES_PER_HOST)
+
+        # Title index of the child pages, listed once per parent page.
+        self._child_pages: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._child_pages_lock = threading.Lock()
+
+        self.session = kwargs.get('session', None)
+        if self.session is None:
+            self._create_session(
+                kwargs.get('pool_maxsize', DEFAULT_POOL_MAXSIZE),
+                kwargs.get('max_retries', DEFAULT_MAX_RETRIES),
+                kwargs.get('backoff_factor', DEFAULT_BACKOFF_FACTOR),
+            )
 
         logging.info(f"Instantiated Manager in '{os.path.abspath(__file__)}'")
 
@@ -64,14 +135,162 @@ class Manager:
             raise Exception(f"Did not find 'space_key' in the 'confluence' section in the configuration file '{self.config_file}'")
         self.space_key = self.config['confluence']['space_key']
 
+    def _create_session(self, pool_maxsize: int, max_retries: int, backoff_factor: float) -> None:
+        # POST is not retried on a response since the page may have been created.
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(['GET', 'PUT']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.verify = False
+        logging.info(f"Created session with {pool_maxsize=} {max_retries=} {backoff_factor=}")
+
+    def close(self) -> None:
+        """Close the connections to the Confluence server."""
+        self.session.close()
+
+    def _get_page_cache_key(self, title: str) -> str:
+        return json.dumps([self.space_key, title])
+
+    def _load_page_cache(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.page_cache_file):
+            return {}
+        try:
+            with open(self.page_cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read the page cache file '{self.page_cache_file}' so will ignore it: {e}")
+            return {}
+
+    def _write_page_cache(self, page_cache: Dict[str, Dict[str, Any]]) -> None:
+        pathlib.Path(os.path.dirname(self.page_cache_file)).mkdir(parents=True, exist_ok=True)
+        tmp_file = f"{self.page_cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(page_cache, f)
+        os.replace(tmp_file, self.page_cache_file)
+
+    def get_cached_page(self, title: str) -> Optional[Dict[str, Any]]:
+        """Get the page ID, version and storage body hash recorded when the page was last published.
+
+        Args:
+            title (str): The title of the page.
+
+        Returns:
+            Optional[Dict[str, Any]]: The 'sha256', 'page_id' and 'version' of the page or None if it was not published before.
+        """
+        with _page_cache_lock:
+            return self._load_page_cache().get(self._get_page_cache_key(title))
+
+    def save_cached_page(self, title: str, html_content: str, pid: int, version: int) -> None:
+        """Record the page ID, version and storage body hash of the page that was published.
+
+        Args:
+            title (str): The title of the page.
+            html_content (str): The storage body that was published.
+            pid (int): The page ID.
+            version (int): The version of the page after the update.
+        """
+        with _page_cache_lock:
+            page_cache = self._load_page_cache()
+            page_cache[self._get_page_cache_key(title)] = {
+                'sha256': hashlib.sha256(html_content.encode('utf-8')).hexdigest(),
+                'page_id': pid,
+                'version': version,
+            }
+            self._write_page_cache(page_cache)
+
+        logging.info(f"Cached page '{title}' with page ID '{pid}' and version '{version}'")
+
+    def forget_cached_page(self, title: str) -> None:
+        """Remove the page from the page cache, e.g.: after it was deleted.
+
+        Args:
+            title (str): The title of the page.
+        """
+        with _page_cache_lock:
+            page_cache = self._load_page_cache()
+            if page_cache.pop(self._get_page_cache_key(title), None) is None:
+                return
+            self._write_page_cache(page_cache)
+
+        logging.info(f"Removed page '{title}' from the page cache")
+
+    def get_child_pages(self, auth, parent_page_id: int = None) -> Dict[str, Dict[str, Any]]:
+        """Get the child pages of the parent page by title.
+
+        The children are listed once per parent page with their versions and
+        the index is kept for every later page published under that parent.
+
+        Args:
+            auth: The Confluence username and password.
+            parent_page_id (int): The parent page ID - default is the configured parent page.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The 'id' and 'version' of each child page by title.
+        """
+        if parent_page_id is None:
+            parent_page_id = self.parent_page_id
+
+        with self._child_pages_lock:
+            if str(parent_page_id) in self._child_pages:
+                return self._child_pages[str(parent_page_id)]
+
+            logging.info(f"Will attempt to list the child pages of page with ID '{parent_page_id}'")
+
+            child_pages = {}
+            start = 0
+            while True:
+                result = self.session.get(
+                    f"{self.rest_api_url}/{parent_page_id}/child/page",
+                    headers={'Accept': 'application/json'},
+                    auth=auth,
+                    params={'expand': 'version', 'start': start, 'limit': DEFAULT_CHILD_PAGE_LIMIT},
+                    timeout=self.timeout
+                )
+                result.raise_for_status()
+
+                json_output = json.loads(result.text)
+                for page in json_output['results']:
+                    child_pages[page['title']] = {
+                        'id': page['id'],
+                        'version': page.get('version', {}).get('number'),
+                    }
+
+                start += len(json_output['results'])
+                if len(json_output['results']) == 0 or 'next' not in json_output.get('_links', {}):
+                    break
+
+            logging.info(f"Found '{len(child_pages)}' child pages of page with ID '{parent_page_id}'")
+            self._child_pages[str(parent_page_id)] = child_pages
+            return child_pages
+
     def create_page(
         self,
         auth: Union[Tuple[str, str], None] = None,
         parent_page_id: int = None,
         content_type: str = DEFAULT_CONTENT_TYPE,
         title: str = None,
-        html_content: str = None) -> List[str]:
-        """Create the Confluence page for the Jira epic."""
+        html_content: str = None,
+        force: bool = False) -> str:
+        """Create the Confluence page for the Jira epic.
+
+        Nothing is sent to Confluence when the storage body is identical to
+        the one that was last published to the page, unless force is set.
+        A page that was published before is updated directly using its cached
+        page ID and version; it is only looked up by title when Confluence
+        rejects those with a 404 or 409.
+
+        Returns:
+            str: 'unchanged', 'updated' or 'error'.
+        """
         if parent_page_id is None:
             parent_page_id = self.parent_page_id
         if title is None:
@@ -84,17 +303,48 @@ class Manager:
             'Content-Type': 'application/json',
         }
 
+        cached_page = self.get_cached_page(title)
+        if cached_page is not None:
+            if not force and cached_page['sha256'] == hashlib.sha256(html_content.encode('utf-8')).hexdigest():
+                print(f"Page with title '{title}' and page ID '{cached_page['page_id']}' is unchanged since version '{cached_page['version']}' so will not update it")
+                logging.info(f"Page with title '{title}' and page ID '{cached_page['page_id']}' is unchanged since version '{cached_page['version']}' so will not update it")
+                return 'unchanged'
+
+            # Trust the cached page ID and version until Confluence says otherwise.
+            pid = cached_page['page_id']
+            version = int(cached_page['version']) + 1
+            result = self._put_page(pid, headers, auth, title, html_content, version)
+            if result.status_code not in (404, 409):
+                version = self._check_update(result, title, version)
+                return self._record_update(title, html_content, pid, version, parent_page_id)
+
+            logging.info(f"Cached page ID '{pid}' and version '{cached_page['version']}' of page '{title}' are stale ({result.status_code}) so will look up the page")
+
+        try:
+            child_page = self.get_child_pages(auth, parent_page_id).get(title)
+        except Exception as e:
+            logging.warning(f"Could not list the child pages of page with ID '{parent_page_id}' so will search by title: {e}")
+            child_page = None
+
+        if child_page is not None:
+            pid = child_page['id']
+            print(f"Page with title '{title}' and page ID '{pid}' in home space '{self.config['confluence']['home_space']}' already exists so will update it")
+            logging.info(f"Page with title '{title}' and page ID '{pid}' in home space '{self.config['confluence']['home_space']}' already exists so will update it")
+            version = self.update_page(pid, headers, auth, title, html_content, child_page['version'])
+            return self._record_update(title, html_content, pid, version, parent_page_id)
+
         params = {
             'spaceKey': self.space_key,
-            'title': title
+            'title': title,
+            'expand': 'version'
         }
 
-        result = requests.get(
+        result = self.session.get(
             self.rest_api_url,
             headers=headers,
             auth=auth,
             params=params,
-            verify=False
+            timeout=self.timeout
         )
 
         json_output = json.loads(result.text)
@@ -103,19 +353,184 @@ class Manager:
 
         if json_output['results'] and len(json_output["results"]) > 0 and "id" in json_output["results"][0]:
             pid = json_output['results'][0]['id']
+            version = json_output['results'][0].get('version', {}).get('number')
             print(f"Page with title '{title}' and page ID '{pid}' in home space '{self.config['confluence']['home_space']}' already exists so will update it")
             logging.info(f"Page with title '{title}' and page ID '{pid}' in home space '{self.config['confluence']['home_space']}' already exists so will update it")
         else:
-            pid = self._create_page(headers, auth, parent_page_id, title, content_type)
+            pid, version = self._create_page(headers, auth, parent_page_id, title, content_type)
+
+        version = self.update_page(pid, headers, auth, title, html_content, version)
+        return self._record_update(title, html_content, pid, version, parent_page_id)
 
-        self.update_page(pid, headers, auth, title, html_content)
+    def _record_update(self, title: str, html_content: str, pid: int, version: Optional[int], parent_page_id: int) -> str:
+        if version is None:
+            return 'error'
+
+        self.save_cached_page(title, html_content, pid, version)
+        with self._child_pages_lock:
+            if str(parent_page_id) in self._child_pages:
+                self._child_pages[str(parent_page_id)][title] = {'id': pid, 'version': version}
+        return 'updated'
+
+    def publish_pages(
+        self,
+        jobs: List[Tuple],
+        auth: Union[Tuple[str, str], None] = None,
+        parent_page_id: int = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        force: bool = False) -> List[Dict[str, Any]]:
+        """Publish a batch of pages at the same time.
+
+        At most max_workers pages are published at once by this call and at
+        most max_pages_per_host pages at once to the Confluence host by all
+        Managers in the process.  The titles must be unique within the batch.
+
+        Args:
+            jobs (List[Tuple]): The title, storage body and optionally the parent page ID of each page.
+            auth: The Confluence username and password.
+            parent_page_id (int): The parent page ID - default is the configured parent page.
+            max_workers (int): The maximum number of pages to publish at the same time.
+            force (bool): If true, update the pages even when their content has not changed.
+
+        Returns:
+            List[Dict[str, Any]]: The 'title', 'status' ('unchanged', 'updated' or 'error'), 'error' and 'seconds' of each page, in job order.
+        """
+        semaphore = _get_host_semaphore(urlparse(self.rest_api_url).netloc, self.max_pages_per_host)
+
+        def publish(job: Tuple) -> Dict[str, Any]:
+            title, html_content = job[:2]
+            job_parent_page_id = job[2] if len(job) > 2 else parent_page_id
+            error = None
+            with semaphore:
+                start = time.perf_counter()
+                try:
+                    status = self.create_page(
+                        auth=auth,
+                        parent_page_id=job_parent_page_id,
+                        title=title,
+                        html_content=html_content,
+                        force=force
+                    )
+                except Exception as e:
+                    logging.exception(f"Encountered some exception while attempting to publish page '{title}'")
+                    status = 'error'
+                    error = str(e)
+                seconds = time.perf_counter() - start
+
+            logging.info(f"Published page '{title}' with status '{status}' in '{seconds:.3f}' seconds")
+            return {'title': title, 'status': status, 'error': error, 'seconds': seconds}
+
+        logging.info(f"Will attempt to publish '{len(jobs)}' pages with '{max_workers}' workers")
+
+        if max_workers <= 1:
+            return [publish(job) for job in jobs]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(publish, jobs))
+
+    def publish_page_sets(
+        self,
+        page_sets: List[List[Tuple[str, str]]],
+        auth: Union[Tuple[str, str], None] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        force: bool = False) -> List[Dict[str, Any]]:
+        """Publish pages that may each be split into child pages.
+
+        The first page of every set is published under the configured parent
+        page.  Once those are published, the remaining pages of each set are
+        published as children of the first page of their set.  Part pages
+        left over from an earlier, longer split of a set, as recorded in the
+        page cache, are then deleted.
+
+        Args:
+            page_sets (List[List[Tuple[str, str]]]): The title and storage body of each page in each set.
+            auth: The Confluence username and password.
+            max_workers (int): The maximum number of pages to publish at the same time.
+            force (bool): If true, update the pages even when their content has not changed.
+
+        Returns:
+            List[Dict[str, Any]]: The 'title', 'status', 'error' and 'seconds' of the first page of each set, in set order, where the status is 'error' if any page of the set failed and 'updated' if any was updated.
+        """
+        results = self.publish_pages([pages[0] for pages in page_sets], auth=auth, max_workers=max_workers, force=force)
+
+        child_jobs = []
+        child_sets = []
+        for index, (pages, result) in enumerate(zip(page_sets, results)):
+            if len(pages) == 1 or result['status'] == 'error':
+                continue
+            cached_page = self.get_cached_page(pages[0][0])
+            for title, html_content in pages[1:]:
+                child_jobs.append((title, html_content, cached_page['page_id']))
+                child_sets.append(index)
+
+        for index, child_result in zip(child_sets, self.publish_pages(child_jobs, auth=auth, max_workers=max_workers, force=force)):
+            result = results[index]
+            result['seconds'] += child_result['seconds']
+            if child_result['status'] == 'error':
+                result['status'] = 'error'
+                result['error'] = f"page '{child_result['title']}': {child_result['error']}"
+            elif child_result['status'] == 'updated' and result['status'] == 'unchanged':
+                result['status'] = 'updated'
+
+        for pages, result in zip(page_sets, results):
+            if result['status'] == 'error':
+                continue
+            title = pages[0][0]
+            # The children are only listed if a part after the current last one was published before.
+            if self.get_cached_page(get_part_title(title, len(pages))) is None:
+                continue
+            try:
+                if self.delete_stale_parts(auth, title, [part_title for part_title, _ in pages[1:]]) > 0 and result['status'] == 'unchanged':
+                    result['status'] = 'updated'
+            except Exception as e:
+                logging.warning(f"Could not delete the stale parts of page '{title}': {e}")
+                rprint(f"[bold yellow]Could not delete the stale parts of page '{title}' - please delete them by hand: {e}[/]")
+
+        return results
+
+    def delete_stale_parts(self, auth, title: str, part_titles: List[str]) -> int:
+        """Delete the child pages of the page that are parts of its table other than the current ones.
+
+        Args:
+            auth: The Confluence username and password.
+            title (str): The title of the page.
+            part_titles (List[str]): The titles of the current parts of the page.
+
+        Returns:
+            int: The number of deleted pages.
+        """
+        pid = self.get_cached_page(title)['page_id']
+        child_pages = self.get_child_pages(auth, pid)
+
+        stale_titles = [
+            child_title for child_title in list(child_pages)
+            if child_title not in part_titles and get_part_number(title, child_title) is not None
+        ]
+
+        for child_title in stale_titles:
+            child_pid = child_pages[child_title]['id']
+            logging.info(f"Will attempt to delete stale page '{child_title}' with page ID '{child_pid}'")
+            result = self.session.delete(
+                f"{self.rest_api_url}/{child_pid}",
+                auth=auth,
+                timeout=self.timeout
+            )
+            if result.status_code != 404:
+                result.raise_for_status()
+
+            self.forget_cached_page(child_title)
+            with self._child_pages_lock:
+                child_pages.pop(child_title, None)
+            rprint(f"[green]Deleted the stale Confluence page '{child_title}'[/]")
+
+        return len(stale_titles)
 
     def _create_page(self,
     headers,
     auth,
     parent_page_id: int,
     title: str,
-    content_type: str) -> int:
+    content_type: str) -> Tuple[int, Optional[int]]:
         print(f"Page with title '{title}' does not exist in home space '{self.config['confluence']['home_space']}', so will create it now")
         logging.info(f"Page with title '{title}' does not exist in home space '{self.config['confluence']['home_space']}', so will create it now")
 
@@ -126,12 +541,12 @@ class Manager:
             'ancestors': [{'id': parent_page_id}] # ID of the parent page
         }
 
-        result = requests.post(
+        result = self.session.post(
             self.rest_api_url,
             headers=headers,
             auth=auth,
             json=data,
-            verify=False
+            timeout=self.timeout
         )
 
         json_output = json.loads(result.text)
@@ -146,25 +561,71 @@ class Manager:
         logging.info(f"Page with title '{title}' has created and assigned pagd ID '{pid}'")
         print(f"Page with title '{title}' has created and assigned pagd ID '{pid}'")
 
-        return pid
+        return pid, json_output.get('version', {}).get('number')
 
-    def update_page(self,
-    pid: int, headers: Dict[str,str],
-    auth,
-    title: str,
-    html_content: str) -> None:
+    def get_version(self, pid: int, headers: Dict[str, str], auth) -> int:
+        """Get the current version of the page.
+
+        Args:
+            pid (int): The page ID.
+            headers (Dict[str, str]): The request headers.
+            auth: The Confluence username and password.
 
-        logging.info(f"Will attempt to retrieve content for page with ID '{pid}'")
-        result = requests.get(
+        Returns:
+            int: The current version of the page.
+        """
+        logging.info(f"Will attempt to retrieve the version of page with ID '{pid}'")
+        result = self.session.get(
             f"{self.rest_api_url}/{pid}",
             headers=headers,
             auth=auth,
-            verify=False
+            params={'expand': 'version'},
+            timeout=self.timeout
         )
 
         json_output = json.loads(result.text)
 
-        version = int(json_output['version']['number']) + 1
+        return int(json_output['version']['number'])
+
+    def update_page(self,
+    pid: int, headers: Dict[str,str],
+    auth,
+    title: str,
+    html_content: str,
+    current_version: Optional[int] = None) -> Optional[int]:
+        """Update the content of the page.
+
+        If another update got in first the version is looked up again and
+        the update is retried once.
+
+        Args:
+            current_version (Optional[int]): The version of the page as it was looked up - default is to retrieve it.
+
+        Returns:
+            Optional[int]: The new version of the page or None if the update failed.
+        """
+        if current_version is None:
+            current_version = self.get_version(pid, headers, auth)
+
+        for attempt in range(2):
+            version = int(current_version) + 1
+            result = self._put_page(pid, headers, auth, title, html_content, version)
+
+            if result.status_code != 409 or attempt == 1:
+                break
+
+            logging.warning(f"Version '{version}' of page '{title}' conflicts with an update made since version '{current_version}' was looked up so will retry")
+            current_version = self.get_version(pid, headers, auth)
+
+        return self._check_update(result, title, version)
+
+    def _put_page(self,
+    pid: int,
+    headers: Dict[str, str],
+    auth,
+    title: str,
+    html_content: str,
+    version: int) -> requests.Response:
 
         logging.info(f"Will attempt to update the page content - new version will be '{version}'")
 
@@ -183,20 +644,23 @@ class Manager:
         }
 
         logging.info(f"{data=}")
-        result = requests.put(
+        return self.session.put(
             f"{self.rest_api_url}/{pid}",
             headers=headers,
             auth=auth,
             json=data,
-            verify=False
+            timeout=self.timeout
         )
 
+    def _check_update(self, result: requests.Response, title: str, version: int) -> Optional[int]:
         json_output = json.loads(result.text)
         logging.info(f"{json_output=}")
 
         if 'statusCode' in json_output and int(json_output['statusCode']) != 200:
             rprint(f"[bold red]Encountered some error while attempting to update content of page '{title}'.  Please see the log file.[/]")
             logging.error(f"Encountered some error while attempting to update content of page '{title}'.  Please see the log file.")
-        else:
-            logging.info(f"Updated the Confluence page '{title}'")
-            rprint(f"[green]Updated the Confluence page '{title}'[/]")
+            return None
+
+        logging.info(f"Updated the Confluence page '{title}'")
+        rprint(f"[green]Updated the Confluence page '{title}'[/]")
+        return version
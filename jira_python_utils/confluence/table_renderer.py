@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""Render Jira issues as the HTML tables that are published to Confluence.
+
+The columns are compiled once per table into cell renderers, so that the
+rows are written straight into a single buffer without re-deriving the
+status styles for every row.  All text taken from Jira is escaped.
+"""
+import io
+import logging
+from html import escape
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Renders the <td> of one column for an issue.
+CellRenderer = Callable[[Any], str]
+
+# The heading and Jira field of each column of the report tables; None is the issue key.
+HTML_TABLE_COLUMNS = [
+    ('Issue', None),
+    ('Summary', 'summary'),
+    ('Type', 'issuetype'),
+    ('Priority', 'priority'),
+    ('Status', 'status'),
+]
+
+# Jira Issues macro column names that differ from the Jira field; None is the issue key.
+MACRO_COLUMN_NAMES = {
+    None: 'key',
+    'issuetype': 'type',
+}
+
+DEFAULT_MACRO_MAXIMUM_ISSUES = 1000
+
+# Larger tables are split into numbered child pages under an index page.
+DEFAULT_MAX_ROWS_PER_PAGE = 2000
+
+# Separates the title of the index page from the part number in the titles of its child pages.
+PART_TITLE_SEPARATOR = ' - Part '
+
+
+def get_status_colors(config: Dict[str, Any]) -> Dict[str, str]:
+    """Get the colour of each highlighted status from the configuration.
+
+    Args:
+        config (Dict[str, Any]): The configuration object.
+
+    Returns:
+        Dict[str, str]: The colour code by lowercase status name.
+    """
+    color_codes = config['confluence']['status']['color_codes']
+    return {
+        'done': color_codes['done'],
+        'in development': color_codes['in_development'],
+    }
+
+
+def _name_of(value: Any) -> str:
+    return '' if value is None else escape(str(value.name))
+
+
+def _compile_issue_cell(jira_issue_base_url: str) -> CellRenderer:
+    base_url = escape(jira_issue_base_url)
+
+    def render(issue: Any) -> str:
+        key = escape(str(issue.key))
+        return f"<td><a href='{base_url}/{key}' target='_blank'>{key}</a></td>"
+
+    return render
+
+
+def _compile_status_cell(status_colors: Dict[str, str]) -> CellRenderer:
+    styled_cells = {
+        status: f"<td style='font-weight: bold; color: {escape(color)}'>"
+        for status, color in status_colors.items()
+    }
+
+    def render(issue: Any) -> str:
+        status = issue.fields.status.name
+        return f"{styled_cells.get(status.lower(), '<td>')}{escape(status)}</td>"
+
+    return render
+
+
+def _compile_field_cell(field: str) -> CellRenderer:
+    def render(issue: Any) -> str:
+        value = getattr(issue.fields, field, None)
+        if value is None:
+            return "<td></td>"
+        if hasattr(value, 'name'):
+            return f"<td>{_name_of(value)}</td>"
+        return f"<td>{escape(str(value))}</td>"
+
+    return render
+
+
+def compile_columns(
+    columns: List[Tuple[str, Optional[str]]],
+    jira_issue_base_url: str,
+    status_colors: Dict[str, str]) -> List[Tuple[str, CellRenderer]]:
+    """Compile the column definitions into cell renderers.
+
+    Args:
+        columns (List[Tuple[str, Optional[str]]]): The (header, Jira field) pairs in column order - a field of None is the linked issue key.
+        jira_issue_base_url (str): The JIRA issue base url.
+        status_colors (Dict[str, str]): The colour code by lowercase status name.
+
+    Returns:
+        List[Tuple[str, CellRenderer]]: The escaped header and the cell renderer of each column.
+    """
+    compiled = []
+    for header, field in columns:
+        if field is None:
+            render = _compile_issue_cell(jira_issue_base_url)
+        elif field == 'status':
+            render = _compile_status_cell(status_colors)
+        else:
+            render = _compile_field_cell(field)
+        compiled.append((escape(header), render))
+    return compiled
+
+
+def render_table(
+    title: str,
+    issues: Iterable[Any],
+    columns: List[Tuple[str, CellRenderer]],
+    statuses: Optional[Set[str]] = None) -> str:
+    """Render the issues as an HTML table under the title.
+
+    Args:
+        title (str): The title shown above the table.
+        issues (Iterable[Any]): The issues - may be a generator.
+        columns (List[Tuple[str, CellRenderer]]): The compiled columns.
+        statuses (Optional[Set[str]]): The lowercase status names of the issues to include - default is every issue.
+
+    Returns:
+        str: The HTML content.
+    """
+    buffer = io.StringIO()
+    write = buffer.write
+    renderers = [render for _, render in columns]
+
+    write(f"<html><body><h3>{escape(title)}</h3>\n<table><thead><tr>")
+    for header, _ in columns:
+        write(f"<th>{header}</th>")
+    write("</tr></thead><tbody>\n")
+
+    row_ctr = 0
+    for issue in issues:
+        if statuses is not None and issue.fields.status.name.lower() not in statuses:
+            continue
+        write("<tr>")
+        for render in renderers:
+            write(render(issue))
+        write("</tr>\n")
+        row_ctr += 1
+
+    write("</tbody></table></body></html>")
+
+    logging.info(f"Rendered '{row_ctr}' rows in the HTML table with title '{title}'")
+    return buffer.getvalue()
+
+
+def get_part_title(title: str, part: int) -> str:
+    """Get the title of the child page with the numbered part of a split table.
+
+    Args:
+        title (str): The title of the index page.
+        part (int): The part number, starting from 1.
+
+    Returns:
+        str: The title of the child page.
+    """
+    return f"{title}{PART_TITLE_SEPARATOR}{part}"
+
+
+def get_part_number(title: str, part_title: str) -> Optional[int]:
+    """Get the part number from the title of a child page of a split table.
+
+    Args:
+        title (str): The title of the index page.
+        part_title (str): The title of the child page.
+
+    Returns:
+        Optional[int]: The part number or None if the child page is not a part of the table.
+    """
+    prefix = f"{title}{PART_TITLE_SEPARATOR}"
+    if not part_title.startswith(prefix) or not part_title[len(prefix):].isdigit():
+        return None
+    return int(part_title[len(prefix):])
+
+
+def render_index(title: str, part_titles: List[str], row_ctr: int) -> str:
+    """Render the index page that links to the parts of a split table.
+
+    Args:
+        title (str): The title shown above the links.
+        part_titles (List[str]): The titles of the child pages.
+        row_ctr (int): The number of rows across all the parts.
+
+    Returns:
+        str: The HTML content.
+    """
+    buffer = io.StringIO()
+    write = buffer.write
+
+    write(f"<html><body><h3>{escape(title)}</h3>\n")
+    write(f"<p>The '{row_ctr}' issues are split across '{len(part_titles)}' pages:</p>\n<ul>")
+    for part_title in part_titles:
+        write(f"<li><ac:link><ri:page ri:content-title=\"{escape(part_title)}\" /></ac:link></li>")
+    write("</ul></body></html>")
+    return buffer.getvalue()
+
+
+def render_pages(
+    title: str,
+    issues: Iterable[Any],
+    columns: List[Tuple[str, CellRenderer]],
+    max_rows_per_page: Optional[int] = DEFAULT_MAX_ROWS_PER_PAGE,
+    statuses: Optional[Set[str]] = None,
+    heading: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Render the issues as one page or, above max_rows_per_page, as an index page and numbered parts.
+
+    Args:
+        title (str): The title of the page.
+        issues (Iterable[Any]): The issues.
+        columns (List[Tuple[str, CellRenderer]]): The compiled columns.
+        max_rows_per_page (Optional[int]): The maximum number of rows per page - None never splits the table.
+        statuses (Optional[Set[str]]): The lowercase status names of the issues to include - default is every issue.
+        heading (Optional[str]): The heading shown above the table - default is the title.
+
+    Returns:
+        List[Tuple[str, str]]: The title and HTML content of the page, followed by those of its parts if the table was split.
+    """
+    if heading is None:
+        heading = title
+
+    if statuses is not None:
+        issues = [issue for issue in issues if issue.fields.status.name.lower() in statuses]
+    else:
+        issues = list(issues)
+
+    if max_rows_per_page is None or len(issues) <= max_rows_per_page:
+        return [(title, render_table(heading, issues, columns))]
+
+    pages = []
+    for start in range(0, len(issues), max_rows_per_page):
+        part = len(pages) + 1
+        html_content = render_table(get_part_title(heading, part), issues[start:start + max_rows_per_page], columns)
+        pages.append((get_part_title(title, part), html_content))
+
+    logging.info(f"Split the '{len(issues)}' rows of the HTML table with title '{title}' across '{len(pages)}' pages")
+
+    return [(title, render_index(heading, [part_title for part_title, _ in pages], len(issues)))] + pages
+
+
+def render_jira_issues_macro(
+    title: str,
+    query: str,
+    columns: List[Tuple[str, Optional[str]]],
+    server: Optional[str] = None,
+    server_id: Optional[str] = None,
+    maximum_issues: int = DEFAULT_MACRO_MAXIMUM_ISSUES) -> str:
+    """Render a Jira Issues macro that Confluence fills in from Jira whenever the page is viewed.
+
+    Args:
+        title (str): The title shown above the table.
+        query (str): The JQL query.
+        columns (List[Tuple[str, Optional[str]]]): The (header, Jira field) pairs in column order - a field of None is the linked issue key.
+        server (Optional[str]): The name of the Jira application link - default is the primary link.
+        server_id (Optional[str]): The ID of the Jira application link - default is the primary link.
+        maximum_issues (int): The maximum number of issues the macro shows.
+
+    Returns:
+        str: The HTML content.
+    """
+    column_names = ",".join(MACRO_COLUMN_NAMES.get(field, field) for _, field in columns)
+
+    buffer = io.StringIO()
+    write = buffer.write
+
+    write(f"<html><body><h3>{escape(title)}</h3>\n")
+    write("<ac:structured-macro ac:name=\"jira\">")
+    if server is not None:
+        write(f"<ac:parameter ac:name=\"server\">{escape(server)}</ac:parameter>")
+    if server_id is not None:
+        write(f"<ac:parameter ac:name=\"serverId\">{escape(server_id)}</ac:parameter>")
+    write(f"<ac:parameter ac:name=\"columns\">{escape(column_names)}</ac:parameter>")
+    write(f"<ac:parameter ac:name=\"maximumIssues\">{int(maximum_issues)}</ac:parameter>")
+    write(f"<ac:parameter ac:name=\"jqlQuery\">{escape(query)}</ac:parameter>")
+    write("</ac:structured-macro>\n</body></html>")
+
+    return buffer.getvalue()
@@ -1,3 +1,4 @@
+import getpass
 import logging
 import os
 from datetime import datetime
@@ -25,9 +26,10 @@ DEFAULT_CONFIG_FILE = os.path.join(
     'config.yaml'
 )
 
+# getpass also works when $USER is not set, e.g.: under cron or in containers.
 DEFAULT_OUTDIR_BASE = os.path.join(
     '/tmp/',
-    os.getenv("USER"),
+    getpass.getuser(),
     DEFAULT_PROJECT,
 )
 
@@ -42,3 +44,33 @@ LOG_LEVEL = logging.INFO
 
 DEFAULT_VERBOSE = False
 
+# Number of keep-alive connections each cached Jira client keeps per host.
+DEFAULT_HTTP_POOL_MAXSIZE = 10
+
+DEFAULT_SERVER_INFO_CACHE_FILE = os.path.join(
+    os.getenv("HOME"),
+    ".jira",
+    "server_info_cache.json"
+)
+
+# Seconds before the cached Jira server metadata is probed again.
+DEFAULT_SERVER_INFO_TTL = 24 * 60 * 60
+
+# Number of issues requested per page when walking search results.
+DEFAULT_SEARCH_PAGE_SIZE = 100
+
+# Number of pages a concurrent search holds before the consumer reads them.
+DEFAULT_SEARCH_PREFETCH_PAGES = 2
+
+# Number of searches run concurrently on the shared Jira client.
+DEFAULT_MAX_WORKERS = 4
+
+# Maximum number of epic keys combined into one '"Epic Link" in (...)' search.
+DEFAULT_COALESCE_CHUNK_SIZE = 50
+
+DEFAULT_MIRROR_DB_FILE = os.path.join(
+    os.getenv("HOME"),
+    ".jira",
+    "mirror.sqlite3"
+)
+
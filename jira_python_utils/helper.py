@@ -1,43 +1,196 @@
+from __future__ import annotations
+
+import json
 import logging
 import os
+import pathlib
+import queue
 import sys
+import threading
+import time
 
-from jira import JIRA
+from concurrent.futures import ThreadPoolExecutor
 from rich.console import Console
-from typing import Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import constants
+
+# jira and requests are imported where they are used so that the console
+# scripts that only hand their command to the broker start quickly.
+if TYPE_CHECKING:
+    from jira import JIRA
 
 error_console = Console(stderr=True, style="bold red")
 
 console = Console()
 
+# One authenticated JIRA client per (url, username, password) for the life of the process.
+_jira_clients: Dict[Tuple[str, str, str], JIRA] = {}
+
+_jira_clients_lock = threading.Lock()
+
+
+def load_server_info(
+    url: str,
+    cache_file: str = constants.DEFAULT_SERVER_INFO_CACHE_FILE,
+    ttl: int = constants.DEFAULT_SERVER_INFO_TTL) -> Optional[Dict[str, Any]]:
+    """Load the cached server metadata for the url.
+
+    Args:
+        url (str): The REST URL.
+        cache_file (str): The server metadata cache file.
+        ttl (int): The number of seconds the cached metadata remains valid.
+
+    Returns:
+        Optional[Dict[str, Any]]: The metadata or None if missing or expired.
+    """
+    if not os.path.exists(cache_file):
+        return None
+
+    try:
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read the server metadata cache file '{cache_file}': {e}")
+        return None
+
+    server_info = cache.get(url)
+    if server_info is None:
+        return None
+
+    if time.time() - server_info['cached_at'] > ttl:
+        logging.info(f"Cached server metadata for url '{url}' has expired")
+        return None
+
+    return server_info
+
+
+def save_server_info(
+    url: str,
+    server_info: Dict[str, Any],
+    cache_file: str = constants.DEFAULT_SERVER_INFO_CACHE_FILE) -> Dict[str, Any]:
+    """Record the server metadata for the url in the cache file.
+
+    Args:
+        url (str): The REST URL.
+        server_info (Dict[str, Any]): The response of the serverInfo resource.
+        cache_file (str): The server metadata cache file.
+
+    Returns:
+        Dict[str, Any]: The metadata as it was cached.
+    """
+    cache = {}
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Will overwrite the unreadable server metadata cache file '{cache_file}': {e}")
+
+    cache[url] = {
+        'version_numbers': server_info['versionNumbers'],
+        'deployment_type': server_info.get('deploymentType'),
+        'base_url': server_info.get('baseUrl'),
+        'cached_at': time.time(),
+    }
+
+    pathlib.Path(os.path.dirname(cache_file)).mkdir(parents=True, exist_ok=True)
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_file, cache_file)
+
+    logging.info(f"Cached the server metadata for url '{url}' in '{cache_file}'")
+
+    return cache[url]
+
+
+def get_jira_client(
+    url: str,
+    username: str,
+    password: str,
+    pool_maxsize: int = constants.DEFAULT_HTTP_POOL_MAXSIZE) -> JIRA:
+    """Get the shared JIRA client for the url and credentials.
+
+    The client is instantiated on the first call and then reused, so the
+    authentication probe and the TLS handshakes are paid once per process.
+    The server-info probe is skipped while the on-disk server metadata for
+    the url has not expired.
+
+    Args:
+        url (str): The REST URL.
+        username (str): The username.
+        password (str): The password.
+        pool_maxsize (int): The number of keep-alive connections to keep per host.
+
+    Returns:
+        JIRA: The JIRA class instance
+    """
+    from jira import JIRA
+    from requests.adapters import HTTPAdapter
+
+    # The password is part of the key so that a changed credential file gets a new client.
+    key = (url, username, password)
+
+    with _jira_clients_lock:
+        auth_jira = _jira_clients.get(key)
+        if auth_jira is not None:
+            logging.info(f"Reusing the JIRA client for url '{url}' and username '{username}'")
+            return auth_jira
+
+        options = {
+            'server': url,
+            'verify': False
+        }
+
+        logging.info(f"options: {options}")
+
+        auth_jira = JIRA(
+            options=options,
+            basic_auth=(username, password),
+            get_server_info=False
+        )
+
+        if auth_jira is None:
+            error_console.print(f"Could not instantiate JIRA for url '{url}'")
+            sys.exit(1)
+
+        server_info = load_server_info(url)
+        if server_info is None:
+            server_info = save_server_info(url, auth_jira.server_info())
+        else:
+            logging.info(f"Using the cached server metadata for url '{url}'")
+
+        # The same attributes JIRA sets when it runs the probe itself.
+        auth_jira._version = tuple(server_info['version_numbers'])
+        auth_jira.deploymentType = server_info['deployment_type']
+
+        # The session already sends keep-alive; size its pool so that concurrent
+        # callers sharing this client do not discard connections.
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        auth_jira._session.mount('https://', adapter)
+        auth_jira._session.mount('http://', adapter)
+
+        _jira_clients[key] = auth_jira
 
-def get_auth_jira(credential_file: str, url: str):
+    return auth_jira
+
+
+def get_auth_jira(credential_file: str, url: str, pool_maxsize: int = constants.DEFAULT_HTTP_POOL_MAXSIZE):
     """Instantiate the JIRA object.
 
     Args:
         credential_file (str): the credentials file
         url: the REST URL
+        pool_maxsize (int): The number of keep-alive connections to keep per host.
 
     Returns:
         JIRA: The JIRA class instance
     """
     username, password = get_username_password(credential_file)
 
-    options = {
-        'server': url,
-        'verify': False
-    }
-
-    logging.info(f"options: {options}")
-
-    auth_jira = JIRA(
-        options=options,
-        basic_auth=(username, password)
-    )
-
-    if auth_jira is None:
-        error_console.print(f"Could not instantiate JIRA for url '{url}'")
-        sys.exit(1)
+    auth_jira = get_jira_client(url, username, password, pool_maxsize)
 
     auth = (username, password)
 
@@ -120,32 +273,234 @@ def get_username(credential_file: str) -> str:
     return username
 
 
-def get_auth(credential_file: str, url: str):
+def get_auth(credential_file: str, url: str, pool_maxsize: int = constants.DEFAULT_HTTP_POOL_MAXSIZE):
     """Instantiate the JIRA object.
 
     Args:
         credential_file (str): the credentials file
         url: the REST URL
+        pool_maxsize (int): The number of keep-alive connections to keep per host.
 
     Returns:
         JIRA: The JIRA class instance
     """
     username, password = get_credentials(credential_file)
 
-    options = {
-        'server': url,
-        'verify': False
-    }
+    return get_jira_client(url, username, password, pool_maxsize)
 
-    auth_jira = JIRA(options=options, basic_auth=(username, password))
 
-    if auth_jira is None:
-        error_console.print(f"Could not instantiate JIRA for url '{url}'")
-        sys.exit(1)
+def iter_search_issues(
+    auth_jira: JIRA,
+    query: str,
+    page_size: int = constants.DEFAULT_SEARCH_PAGE_SIZE,
+    fields: Optional[List[str]] = None) -> Iterator[Any]:
+    """Walk every page of the search results and yield the issues as they arrive.
+
+    Only one page of issues is held in memory at a time.
+
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+        query (str): The JQL query.
+        page_size (int): The number of issues to request per page.
+        fields (Optional[List[str]]): The fields to retrieve - default is all fields.
+
+    Yields:
+        Iterator[Any]: The issues.
+    """
+    for page in _iter_search_pages(auth_jira, query, page_size, fields):
+        yield from page
+
+
+def _iter_search_pages(
+    auth_jira: JIRA,
+    query: str,
+    page_size: int,
+    fields: Optional[List[str]]) -> Iterator[List[Any]]:
+    start_at = 0
+
+    while True:
+        logging.info(f"Will attempt to retrieve issues {start_at} to {start_at + page_size} with query '{query}'")
+        page = auth_jira.search_issues(
+            query,
+            startAt=start_at,
+            maxResults=page_size,
+            fields=None if fields is None else ",".join(fields)
+        )
+
+        yield page
+
+        # The server may cap maxResults below page_size, so rely on the total.
+        start_at += len(page)
+        if len(page) == 0 or start_at >= page.total:
+            break
+
+
+def map_search_issues(
+    auth_jira: JIRA,
+    queries: List[str],
+    max_workers: int = constants.DEFAULT_MAX_WORKERS,
+    page_size: int = constants.DEFAULT_SEARCH_PAGE_SIZE,
+    fields: Optional[List[str]] = None,
+    prefetch_pages: int = constants.DEFAULT_SEARCH_PREFETCH_PAGES) -> Iterator[Iterable[Any]]:
+    """Run the queries on a bounded thread pool and yield their issues in query order.
+
+    The issues of each query stream page by page.  The queries after the one
+    being consumed keep running, but each of them holds at most prefetch_pages
+    pages before it waits for the consumer, so at most about
+    max_workers * (prefetch_pages + 1) * page_size issues are in memory.  With
+    max_workers of 1 the queries run one after another without prefetching.
+
+    A query that is not consumed in full is drained when the next one is
+    requested.  An error is raised while iterating the issues of its query.
+
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+        queries (List[str]): The JQL queries.
+        max_workers (int): The maximum number of queries to run at the same time.
+        page_size (int): The number of issues to request per page.
+        fields (Optional[List[str]]): The fields to retrieve - default is all fields.
+        prefetch_pages (int): The maximum number of pages each query holds before it is consumed.
+
+    Yields:
+        Iterator[Iterable[Any]]: The issues for each query.
+    """
+    if max_workers <= 1:
+        for query in queries:
+            yield iter_search_issues(auth_jira, query, page_size, fields)
+        return
+
+    # Set when the consumer goes away so that the workers stop waiting for it.
+    stop = threading.Event()
+
+    def put(pages: queue.Queue, item: Any) -> None:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def search(pages: queue.Queue, query: str) -> None:
+        try:
+            for page in _iter_search_pages(auth_jira, query, page_size, fields):
+                put(pages, page)
+                if stop.is_set():
+                    return
+        except Exception as e:
+            put(pages, e)
+        else:
+            put(pages, None)
+
+    def drain(pages: queue.Queue) -> Iterator[Any]:
+        while True:
+            page = pages.get()
+            if page is None:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield from page
+
+    logging.info(f"Will run '{len(queries)}' queries with at most '{max_workers}' at the same time")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            # The queries start in order, so the one being consumed always has a worker.
+            pending = []
+            for query in queries:
+                pages = queue.Queue(maxsize=max(1, prefetch_pages))
+                executor.submit(search, pages, query)
+                pending.append(pages)
+
+            for pages in pending:
+                issues = drain(pages)
+                yield issues
+                # Finish the query before moving on so that its worker is released.
+                for _ in issues:
+                    pass
+        finally:
+            stop.set()
+            executor.shutdown(cancel_futures=True)
+
+
+def get_link_type_name(auth_jira: JIRA, link_type: str) -> str:
+    """Get the name of the issue link type from its name or its inward or outward description.
+
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+        link_type (str): The name, inward or outward description of the link type e.g.: 'relates to'.
+
+    Raises:
+        Exception: If there is no such link type.
+
+    Returns:
+        str: The name of the link type e.g.: 'Relates'.
+    """
+    for issue_link_type in auth_jira.issue_link_types():
+        if link_type.lower() in (issue_link_type.name.lower(), issue_link_type.inward.lower(), issue_link_type.outward.lower()):
+            return issue_link_type.name
+    raise Exception(f"Could not find the issue link type '{link_type}'")
+
+
+def bulk_create_issues(auth_jira: JIRA, issue_updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Create the issues with one request to the bulk create endpoint.
+
+    Unlike JIRA.create_issues, each issue update may carry an 'update'
+    section, e.g.: to add issue links, and no further requests are made.
+
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+        issue_updates (List[Dict[str, Any]]): The 'fields' and optional 'update' of each issue.
+
+    Returns:
+        List[Dict[str, Any]]: The 'key' and 'error' of each issue, in order - the key is None if the issue was not created.
+    """
+    from jira.exceptions import JIRAError
+
+    logging.info(f"Will attempt to create '{len(issue_updates)}' issues with one bulk request")
+
+    try:
+        response = auth_jira._session.post(
+            auth_jira._get_url('issue/bulk'),
+            data=json.dumps({'issueUpdates': issue_updates}),
+        )
+    except JIRAError as e:
+        # Jira answers 400 when none of the issues could be created.
+        if e.status_code != 400 or e.response is None:
+            raise
+        response = e.response
+    result = json.loads(response.text)
+
+    errors = {error['failedElementNumber']: error['elementErrors'] for error in result.get('errors', [])}
+    issues = iter(result.get('issues', []))
+
+    created = []
+    for index in range(len(issue_updates)):
+        if index in errors:
+            created.append({'key': None, 'error': errors[index]})
+        else:
+            created.append({'key': next(issues)['key'], 'error': None})
+    return created
+
+
+def add_labels(auth_jira: JIRA, issue: str, labels: List[str]) -> None:
+    """Add the labels to the issue with one request.
+
+    The 'add' operation keeps the labels the issue already has, so the
+    issue does not need to be retrieved first.
+
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+        issue (str): The issue ID.
+        labels (List[str]): The labels - spaces are replaced with dashes.
+    """
+    update = {'labels': [{'add': label.strip().replace(' ', '-')} for label in labels]}
+    auth_jira._session.put(
+        auth_jira._get_url(f"issue/{issue}"),
+        data=json.dumps({'update': update}),
+    )
 
-    return auth_jira
 
 def get_summary(issue_id: str, credential_file: str, rest_url_file: str) -> str:
     auth_jira = get_auth(credential_file, get_jira_url(rest_url_file))
-    jira_issue = auth_jira.issue(issue_id)
+    jira_issue = auth_jira.issue(issue_id, fields='summary')
     return jira_issue.fields.summary
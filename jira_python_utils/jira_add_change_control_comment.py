@@ -8,7 +8,8 @@ import json
 from typing import Optional
 
 
-from .helper import get_jira_url, get_auth
+from . import broker
+from .helper import get_jira_url
 from .file_utils import check_infile_status
 
 from rich.console import Console
@@ -159,11 +160,9 @@ def main(change_control_id: str, credential_file: Optional[str], config_file: Op
         comment += f"* [~{signer}]\n"
     comment += f"\nReference:\n{docusign_full_url}"
 
-    auth_jira = get_auth(credential_file, get_jira_url(rest_url_file))
-
     console.print(f"Will attempt to add the following to issue '{issue}':\n\n{comment}")
 
-    auth_jira.add_comment(issue, comment)
+    broker.run('add_comment', get_jira_url(rest_url_file), credential_file, issue=issue, comment=comment)
 
     console.print("\n[bold green]Done[/]")
 
@@ -5,7 +5,8 @@ import sys
 
 import click
 
-from .helper import get_jira_url, get_auth
+from . import broker
+from .helper import get_jira_url
 from .file_utils import check_infile_status
 
 from rich.console import Console
@@ -65,15 +66,9 @@ def main(credential_file: str, comment: str, comment_file: str, issue: str):
         with open(comment_file, 'r') as cf:
             comment = cf.read()
 
-    auth_jira = get_auth(credential_file, url)
-
-    if auth_jira is None:
-        error_console.print("Could not instantiate JIRA for url '{}'".format(url))
-        sys.exit(1)
-
     console.print(f"Will attempt to add comment '{comment}' to issue '{issue}'")
 
-    auth_jira.add_comment(issue, comment)
+    broker.run('add_comment', url, credential_file, issue=issue, comment=comment)
 
     console.print(f"Added comment '{comment}' to issue '{issue}'")
 
@@ -8,7 +8,8 @@ import os
 import sys
 import click
 
-from .helper import get_jira_url, get_auth
+from . import broker
+from .helper import get_jira_url
 from .file_utils import check_infile_status
 
 from rich.console import Console
@@ -60,25 +61,13 @@ def main(credential_file, issue, comp):
         click.echo(click.get_current_context().get_help())
         sys.exit(1)
 
-    auth_jira = get_auth(credential_file, get_jira_url(rest_url_file))
-
-    if auth_jira is None:
-        error_console.print("Could not instantiate JIRA auth")
-        sys.exit(1)
-
     console.print(f"Will attempt to add component '{comp}' to JIRA issue '{issue}'")
 
     try:
 
-        i = auth_jira.issue(issue)
-        if i is None:
-            raise Exception(f"Could not retrieve issue object for issue '{issue}'")
-
-        # comp = 'report automation'
-        i.fields.components.append({'name': comp})
-        i.update(fields={'components': i.fields.components})
+        broker.run('add_component', get_jira_url(rest_url_file), credential_file, issue=issue, component=comp)
 
-    except Error as e:
+    except Exception as e:
         error_console.print(f"Encountered some exception while attempting to add component '{comp}' to JIRA issue '{issue}': {e}")
         sys.exit(1)
     else:
@@ -1,10 +1,21 @@
 # -*- coding: utf-8 -*-
+"""Add labels to one or more JIRA issues.
+
+The issues are given with --issue, --issues (use '-' to read them from
+stdin) or --jql.  More than one issue is labelled in-process by a bounded
+pool of workers that share one JIRA client.
+"""
 import os
 import sys
 import click
 
-from .helper import get_jira_url, get_auth
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from . import broker
+from .helper import add_labels, get_auth, get_jira_url, iter_search_issues
 from .file_utils import check_infile_status
+from . import constants
 
 from rich.console import Console
 
@@ -19,11 +30,65 @@ DEFAULT_CREDENTIAL_FILE = os.environ['HOME'] + '/.jira/credentials.txt'
 
 DEFAULT_LINK_TYPE = 'relates to'
 
+# One worker per keep-alive connection of the shared JIRA client.
+DEFAULT_MAX_WORKERS = constants.DEFAULT_HTTP_POOL_MAXSIZE
+
+
+def get_issue_ids(issue: Optional[str], issues: Optional[str]) -> List[str]:
+    """Get the issue IDs from --issue and --issues without duplicates.
+
+    Args:
+        issue (Optional[str]): The JIRA issue.
+        issues (Optional[str]): The comma-separated JIRA issues or '-' to read them from stdin.
+
+    Returns:
+        List[str]: The issue IDs in the order they were given.
+    """
+    issue_ids = []
+    if issue is not None:
+        issue_ids.append(issue)
+
+    if issues == '-':
+        issues = sys.stdin.read()
+
+    if issues is not None:
+        issue_ids.extend(issues.replace(',', ' ').split())
+
+    return list(dict.fromkeys(i.strip() for i in issue_ids))
+
+
+def add_labels_to_issues(auth_jira, issue_ids: List[str], labels: List[str], max_workers: int = DEFAULT_MAX_WORKERS) -> Dict[str, Optional[str]]:
+    """Add the labels to every issue with at most max_workers requests at the same time.
+
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+        issue_ids (List[str]): The issue IDs.
+        labels (List[str]): The labels.
+        max_workers (int): The maximum number of issues to update at the same time.
+
+    Returns:
+        Dict[str, Optional[str]]: The error keyed on the issue ID, in order - the error is None if the labels were added.
+    """
+    def add(issue_id: str) -> Optional[str]:
+        try:
+            add_labels(auth_jira, issue_id, labels)
+        except Exception as e:
+            return str(e)
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return dict(zip(issue_ids, executor.map(add, issue_ids)))
+
+
 @click.command()
 @click.option('--credential_file', help='credential file containing username and password')
-@click.option('--label', help='The child issue')
 @click.option('--issue', help='The JIRA issue')
-def main(credential_file: str, label: str, issue: str):
+@click.option('--issues', help="The comma-separated JIRA issues or '-' to read them from stdin")
+@click.option('--jql', help='A Jira jql query string that selects the issues')
+@click.option('--label', help='The comma-separated labels')
+@click.option('--max_workers', type=int, default=DEFAULT_MAX_WORKERS, help=f"The number of issues to update at the same time - default is '{DEFAULT_MAX_WORKERS}'")
+def main(credential_file: str, issue: str, issues: str, jql: str, label: str, max_workers: int):
+    """Add labels to one or more JIRA issues."""
 
     rest_url_file = DEFAULT_URL_FILE
     check_infile_status(rest_url_file)
@@ -35,8 +100,8 @@ def main(credential_file: str, label: str, issue: str):
 
     error_ctr = 0
 
-    if issue is None:
-        error_console.print("--issue was not specified")
+    if issue is None and issues is None and jql is None:
+        error_console.print("--issue, --issues or --jql was not specified")
         error_ctr += 1
 
     if label is None:
@@ -48,39 +113,64 @@ def main(credential_file: str, label: str, issue: str):
         click.echo(click.get_current_context().get_help())
         sys.exit(1)
 
-    auth_jira = get_auth(credential_file, get_jira_url(rest_url_file))
-
-    console.print(f"Will attempt to add label(s) '{label}' to JIRA issue '{issue}'")
-
-    label_ctr = 0
     labels = label.split(',')
+    label_ctr = len(labels)
 
-    try:
+    issue_ids = get_issue_ids(issue, issues)
 
-        i = auth_jira.issue(issue)
+    if len(issue_ids) == 1 and jql is None:
+        issue = issue_ids[0]
 
-        if i is None:
-            raise Exception(f"Could not retrieve issue object for issue '{issue}'")
+        console.print(f"Will attempt to add label(s) '{label}' to JIRA issue '{issue}'")
 
-        for label in labels:
-            label_ctr += 1
-            label = label.strip().replace(' ', '-')
-            i.fields.labels.append(label)
-        # i.fields.labels.append(u'change-control-form')
-        i.update(fields={'labels': i.fields.labels})
-        # i.update(labels=[label])
+        try:
 
-    except Error as e:
-        if label_ctr == 1:
-            error_console.print(f"Encountered some exception while attempting to add label '{label}' to issue '{issue}': {e}")
+            broker.run('add_labels', get_jira_url(rest_url_file), credential_file, issue=issue, labels=labels)
+
+        except Exception as e:
+            if label_ctr == 1:
+                error_console.print(f"Encountered some exception while attempting to add label '{label}' to issue '{issue}': {e}")
+            else:
+                error_console.print(f"Encountered some exception while attempting to add labels '{label}' to issue '{issue}': {e}")
+            sys.exit(1)
         else:
-            error_console.print(f"Encountered some exception while attempting to add labels '{label}' to issue '{issue}': {e}")
-        sys.exit(1)
-    else:
-        if label_ctr == 1:
-            console.print(f"Added label '{label}' to issue '{issue}'")
+            if label_ctr == 1:
+                console.print(f"Added label '{label}' to issue '{issue}'")
+            else:
+                console.print(f"Added labels '{label}' to issue '{issue}'")
+        return
+
+    auth_jira = get_auth(credential_file, get_jira_url(rest_url_file), max(max_workers, constants.DEFAULT_HTTP_POOL_MAXSIZE))
+
+    if jql is not None:
+        console.print(f"Will attempt to retrieve the issues with query '{jql}'")
+        try:
+            for i in iter_search_issues(auth_jira, jql, fields=['key']):
+                if i.key not in issue_ids:
+                    issue_ids.append(i.key)
+        except Exception as e:
+            error_console.print(f"Encountered some exception while attempting to retrieve the issues with query '{jql}': {e}")
+            sys.exit(1)
+
+    if len(issue_ids) == 0:
+        console.print("No issues to label")
+        return
+
+    console.print(f"Will attempt to add label(s) '{label}' to '{len(issue_ids)}' JIRA issues with '{max_workers}' workers")
+
+    errors = add_labels_to_issues(auth_jira, issue_ids, labels, max_workers)
+
+    for issue_id, error in errors.items():
+        if error is None:
+            console.print(f"Added label(s) '{label}' to issue '{issue_id}'")
         else:
-            console.print(f"Added labels '{label}' to issue '{issue}'")
+            error_console.print(f"Could not add label(s) '{label}' to issue '{issue_id}': {error}")
+
+    failed_ctr = sum(1 for error in errors.values() if error is not None)
+    console.print(f"Added label(s) '{label}' to '{len(errors) - failed_ctr}' of '{len(errors)}' issues")
+
+    if failed_ctr > 0:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
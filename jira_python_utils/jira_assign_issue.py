@@ -4,7 +4,8 @@ import os
 import sys
 import click
 
-from .helper import get_jira_url, get_auth, get_username
+from . import broker
+from .helper import get_jira_url, get_username
 from .file_utils import check_infile_status
 
 from rich.console import Console
@@ -46,15 +47,9 @@ def main(credential_file: str, assignee: str, issue: str):
     if assignee is None:
         assignee = get_username(credential_file)
 
-    auth_jira = get_auth(credential_file, get_jira_url(rest_url_file))
-
-    if auth_jira is None:
-        error_console.print("Could not instantiate JIRA auth for url")
-        sys.exit(1)
-
     console.print(f"Will attempt to assign issue '{issue}' to username '{assignee}'")
 
-    auth_jira.assign_issue(issue, assignee)
+    broker.run('assign_issue', get_jira_url(rest_url_file), credential_file, issue=issue, assignee=assignee)
 
     console.print(f"Assigned issue '{issue}' to username '{assignee}'")
 
@@ -1,230 +1,357 @@
 # -*- coding: utf-8 -*-
 """Create a set of JIRA issues for a software release.
 
+The issues are described by a release plan, a YAML file with a parent
+task and the tasks that are linked to it.  The summary, description and
+labels of every task are templates, e.g.:
+
+    tasks:
+      - name: test-cases
+        summary: "test cases for {codebase} {version}"
+        description: "Identify and collect test cases."
+        labels:
+          - "test-cases"
+          - "{codebase}-{version}"
+
 Raises:
     Exception: Raise if there is a problem emitted by the API.
 """
 import os
 import sys
 import click
+import pathlib
+import yaml
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 from jira import JIRA
-from typing import List
+
+from .helper import bulk_create_issues, get_jira_client, get_link_type_name, iter_search_issues
+from . import constants
 
 
 DEFAULT_URL_FILE = os.path.dirname(__file__) + '/conf/jira_rest_url.txt'
 
 DEFAULT_CREDENTIAL_FILE = os.environ['HOME'] + '/.jira/credentials.txt'
 
+DEFAULT_PLAN_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'conf',
+    'jira_release_plan.yaml'
+)
+
 DEFAULT_ASSIGNEE = 'jsundaram'
 
 DEFAULT_LINK_ISSUES = True
 
 DEFAULT_PROJECT = 'RA'
 
-g_url = None
-g_auth_jira = None
-g_project = None
-g_assignee = None
-g_codebase = None
-g_version = None
-g_server = None
-g_component = None
-g_parent_issue_id = None
-g_issue_type = 'Task'
-g_link_type = 'relates to'
-
-g_issues = []
-
-
-def create_issue_software_release():
-    """Create a new JIRA issue for the 'software release'."""
-    summary = f"software release for {g_codebase} {g_version} on {g_server}"
-    description = f"Need to install software release.\ncode-base: {g_codebase}\nversion: {g_version}\nserver(s): {g_server}"
-    labels = ['software-release', 'install-server:' + g_server, g_codebase + '-' + g_version, g_codebase]
-    return create_issue(summary, description, labels)
-
-
-def create_issue_test_cases_software():
-    """Create a new JIRA issue for the 'test cases'."""
-    summary = f"test cases for {g_codebase} {g_version}"
-    description = f"Identify and collect test cases.\ncode-base: {g_codebase}\nversion: {g_version}"
-    labels = ['test-cases', g_codebase + '-' + g_version, g_codebase]
-    return create_issue(summary, description, labels)
-
-
-def create_issue_install_software():
-    """Create a new JIRA issue for the 'install software'."""
-    summary = f"install software release for {g_codebase} {g_version} on {g_server}"
-    description = f"Need to install software release.\ncode-base: {g_codebase}\nversion: {g_version}\nserver(s): {g_server}"
-    labels = ['software-release', 'install-server:' + g_server, g_codebase + '-' + g_version, g_codebase]
-    return create_issue(summary, description, labels)
-
-
-def create_issue_establish_release_candidate():
-    """Create a new JIRA issue for the 'establish release candidate'."""
-    summary = f"establish next software release candidate for {g_codebase} {g_version}"
-    description = f"Need to establish the next software release candidate.\ncode-base: {g_codebase}\nversion: {g_version}"
-    labels = ['establish-release-candidate', g_codebase + '-' + g_version, g_codebase]
-    return create_issue(summary, description, labels)
-
-
-def create_issue_prepare_change_control():
-    """Create a new JIRA issue for 'prepare change control'."""
-    summary = f"prepare change control to install {g_codebase} {g_version} on {g_server}"
-    description = f"Need to prepare a change control in 123Compliance and DocuSign to install a software release.\ncode-base: {g_codebase}\nversion: {g_version}\nserver(s): {g_server}"
-    labels = ['prepare-change-control', 'install-server:' + g_server, g_codebase + '-' + g_version, g_codebase]
-    return create_issue(summary, description, labels)
-
-
-def  create_issue_prepare_validation_docs():
-    """Create a new JIRA issue for 'prepare validation documents'."""
-    summary = f"prepare validation documents for {g_codebase} {g_version} on {g_server}"
-    description = f"Need to prepare validation documents for a software release.\ncode-base: {g_codebase}\nversion: {g_version}\nserver(s): {g_server}"
-    labels = ['prepare-validation-documents', g_codebase + '-' + g_version, g_codebase]
-    return create_issue(summary, description, labels)
-
-
-def create_issue_execute_validation_checks():
-    """Create a new JIRA issue for 'execute validation checks'."""
-    summary = f"execution validation checks for {g_codebase} {g_version} on {g_server}"
-    description = f"Need to execute validation checks for a software release.\ncode-base: {g_codebase}\nversion: {g_version}\nserver(s): {g_server}"
-    labels = ['execute-validation-checks', 'install-server:' + g_server, g_codebase + '-' + g_version, g_codebase]
-    return create_issue(summary, description, labels)
-
-
-def create_issue_collect_release_documents():
-    """Create a new JIRA issue for 'collect release documents'."""
-    summary = f"collect release documents for {g_codebase} {g_version} on {g_server}"
-    description = f"Need to prepare the binder coverpage and collect all release documents (change control and validation documents) for the software release.\ncode-base: {g_codebase}\nversion: {g_version}\nserver(s): {g_server}"
-    labels = ['collect-release-documents', 'install-server:' + g_server, g_codebase + '-' + g_version, g_codebase]
-    return create_issue(summary, description, labels)
-
-# def create_issue(summary, desc, labels=None):
-#     print("summary '{}'".format(summary))
-#     print("description '{}'\n\n".format(desc))
-#     if labels is not None:
-#         print("Here are the labels:")
-#         for label in labels:
-#             print(label)
-#     print("\n")
-#     return 'ID1'
-
-
-def create_issue(summary: str, description: str, labels: List[str] = None) -> None:
+DEFAULT_ISSUE_TYPE = 'Task'
+
+DEFAULT_LINK_TYPE = 'relates to'
+
+# Jira Cloud accepts at most 50 issues in one bulk create request.
+DEFAULT_BULK_CREATE_CHUNK_SIZE = 50
+
+TASK_KEYS = ('name', 'summary', 'description')
+
+
+def load_release_plan(plan_file: str) -> Dict[str, Any]:
+    """Load and check the release plan.
+
+    Args:
+        plan_file (str): The YAML file with the 'parent' task and the 'tasks'.
+
+    Raises:
+        Exception: If the parent or a task is missing a name, summary or description, or two tasks share a name.
+
+    Returns:
+        Dict[str, Any]: The release plan.
+    """
+    plan = yaml.safe_load(pathlib.Path(plan_file).read_text())
+    if not isinstance(plan, dict) or 'parent' not in plan:
+        raise Exception(f"The release plan '{plan_file}' does not define a 'parent' task")
+
+    plan.setdefault('issue_type', DEFAULT_ISSUE_TYPE)
+    plan.setdefault('link_type', DEFAULT_LINK_TYPE)
+    plan['tasks'] = plan.get('tasks') or []
+
+    names = set()
+    for task in [plan['parent']] + plan['tasks']:
+        for key in TASK_KEYS:
+            if key not in task:
+                raise Exception(f"A task in the release plan '{plan_file}' does not define '{key}': {task}")
+        if task['name'] in names:
+            raise Exception(f"The task '{task['name']}' is defined more than once in the release plan '{plan_file}'")
+        names.add(task['name'])
+
+    return plan
+
+
+def format_template(template: str, context: Dict[str, str]) -> str:
+    """Fill in the placeholders of a release plan template.
+
+    Args:
+        template (str): The template, e.g.: "test cases for {codebase} {version}".
+        context (Dict[str, str]): The values of the placeholders.
+
+    Raises:
+        Exception: If the template refers to an unknown placeholder.
+
+    Returns:
+        str: The formatted template.
+    """
+    try:
+        return str(template).format(**context)
+    except KeyError as e:
+        raise Exception(f"Unknown placeholder {e} in the release plan template '{template}'")
+
+
+def get_issue_update(
+        task: Dict[str, Any],
+        context: Dict[str, str],
+        parent_issue_id: Optional[str] = None,
+        link_type_name: Optional[str] = None) -> Dict[str, Any]:
+    """Get the payload that creates a new JIRA issue in one request.
+
+    The labels, the component and the link to the parent issue are part of
+    the payload instead of being added to the issue after it was created.
+
+    Args:
+        task (Dict[str, Any]): The task from the release plan.
+        context (Dict[str, str]): The project, issue type, assignee, component, code-base, version and server.
+        parent_issue_id (Optional[str]): The parent issue ID that the new issue is linked to.
+        link_type_name (Optional[str]): The name of the link type between the new issue and the parent issue.
+
+    Returns:
+        Dict[str, Any]: The 'fields' and, when linking to the parent issue, the 'update' of the new JIRA issue.
+    """
+    description = format_template(task['description'], context)
+    if parent_issue_id is not None:
+        description += "\nReference: " + parent_issue_id
+
+    # The project and issue type are given as objects so that the client does not look them up.
+    fields = {
+        'project': {'key': context['project']},
+        'summary': format_template(task['summary'], context),
+        'issuetype': {'name': context['issue_type']},
+        'description': description,
+        'assignee': {'name': context['assignee']},
+    }
+
+    labels = [format_template(label, context).strip().replace(' ', '-') for label in task.get('labels') or []]
+    # The task name label identifies the task when the release plan is run again.
+    if task['name'] not in labels:
+        labels.append(task['name'])
+    fields['labels'] = labels
+
+    if context['component']:
+        fields['components'] = [{'name': context['component']}]
+
+    issue_update = {'fields': fields}
+
+    if link_type_name is not None and parent_issue_id is not None:
+        # An issuelinks 'add' takes no comment, unlike create_issue_link, so the
+        # 'Linking <issue> to <parent>' link comment is no longer written and the
+        # Reference line of the description names the parent issue instead.
+        issue_update['update'] = {
+            'issuelinks': [
+                {
+                    'add': {
+                        'type': {'name': link_type_name},
+                        'outwardIssue': {'key': parent_issue_id},
+                    }
+                }
+            ]
+        }
+
+    return issue_update
+
+
+def create_issue(auth_jira: JIRA, url: str, issue_update: Dict[str, Any]) -> str:
     """Create a new JIRA issue.
 
     Args:
-        summary (str): The JIRA issue summary.
-        description (str): The new JIRA issue description.
-        labels (list): The labels that should be applied to the new JIRA issue.
+        auth_jira (JIRA): The authenticated JIRA object.
+        url (str): The JIRA URL.
+        issue_update (Dict[str, Any]): The payload from get_issue_update.
+
+    Returns:
+        str: The new JIRA issue ID.
     """
-    if g_parent_issue_id is not None:
-        description += "\nReference: " + g_parent_issue_id
+    fields = issue_update['fields']
 
-    print(f"Will attempt to create a JIRA issue for project '{g_project}' summary '{summary}' type '{g_issue_type}' assignee '{g_assignee}' and description:\n{description}")
+    print(f"Will attempt to create a JIRA issue for project '{fields['project']['key']}' summary '{fields['summary']}' type '{fields['issuetype']['name']}' assignee '{fields['assignee']['name']}' and description:\n{fields['description']}")
 
     try:
-        new_issue = g_auth_jira.create_issue(
-            project=g_project,
-            summary=summary,
-            issuetype={'name':g_issue_type},
-            description=description,
-            assignee={'name':g_assignee}
-            )
-
-    except Error as e:
+        new_issue = auth_jira.create_issue(fields=fields, prefetch=False)
+    except Exception as e:
         print(f"Encountered some exception while attempting to create a new JIRA issue: '{e}'")
         sys.exit(1)
 
     new_issue_id = new_issue.key
-    new_issue_url = g_url + '/browse/' + new_issue_id
-    print(f"\nCreated new issue with ID '{new_issue_id}'\n{new_issue_url}")
+    print(f"\nCreated new issue with ID '{new_issue_id}'\n{url}/browse/{new_issue_id}")
 
-    if DEFAULT_LINK_ISSUES:
+    return new_issue_id
 
-        if g_parent_issue_id is not None:
 
-            print(f"Will attempt to link parent issue '{g_parent_issue_id}' to this issue '{new_issue_id}' with link type '{g_link_type}'")
+def create_issues(
+        auth_jira: JIRA,
+        url: str,
+        issue_updates: List[Dict[str, Any]],
+        max_workers: int = constants.DEFAULT_MAX_WORKERS,
+        chunk_size: int = DEFAULT_BULK_CREATE_CHUNK_SIZE) -> List[str]:
+    """Create the new JIRA issues with bulk requests that run at the same time.
 
-            try:
-                g_auth_jira.create_issue_link(
-                    type=g_link_type,
-                    inwardIssue=new_issue_id,
-                    outwardIssue=g_parent_issue_id,
-                    comment={
-                        "body": f"Linking {new_issue_id} to {g_parent_issue_id}"
-                    }
-                )
+    The issues are split into chunks of at most chunk_size issues, one bulk
+    request per chunk, and the chunks are sent on the same client.
+
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+        url (str): The JIRA URL.
+        issue_updates (List[Dict[str, Any]]): The payloads from get_issue_update.
+        max_workers (int): The maximum number of bulk requests to send at the same time.
+        chunk_size (int): The maximum number of issues in one bulk request.
+
+    Returns:
+        List[str]: The new JIRA issue IDs.
+    """
+    if len(issue_updates) == 0:
+        return []
+
+    for issue_update in issue_updates:
+        print(f"Will attempt to create a JIRA issue for project '{issue_update['fields']['project']['key']}' summary '{issue_update['fields']['summary']}'")
+
+    chunks = [issue_updates[i:i + chunk_size] for i in range(0, len(issue_updates), chunk_size)]
 
-            except Error as e:
-                print(f"Encountered some exception while attempting to link this issue '{new_issue_id}' to parent issue '{g_parent_issue_id}' with link type '{g_link_type}': {e}")
-                sys.exit(1)
-            else:
-                print(f"Linked this issue '{new_issue_id}' to parent issue '{g_parent_issue_id}' with link type '{g_link_type}'")
+    try:
+        if len(chunks) == 1 or max_workers <= 1:
+            chunk_results = [bulk_create_issues(auth_jira, chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                chunk_results = list(executor.map(lambda chunk: bulk_create_issues(auth_jira, chunk), chunks))
+    except Exception as e:
+        print(f"Encountered some exception while attempting to create the new JIRA issues: '{e}'")
+        sys.exit(1)
 
-    if g_component is not None:
+    results = [result for chunk_result in chunk_results for result in chunk_result]
 
-        try:
+    new_issue_ids = []
+    error_ctr = 0
+    for issue_update, result in zip(issue_updates, results):
+        if result['key'] is None:
+            error_ctr += 1
+            print(f"Could not create a JIRA issue for summary '{issue_update['fields']['summary']}': {result['error']}")
+            continue
 
-            i = g_auth_jira.issue(new_issue_id)
-            if i is None:
-                raise Exception(f"Could not retrieve issue object for issue '{new_issue_id}'")
+        new_issue_id = result['key']
+        print(f"\nCreated new issue with ID '{new_issue_id}'\n{url}/browse/{new_issue_id}")
+        if 'update' in issue_update:
+            link = issue_update['update']['issuelinks'][0]['add']
+            print(f"Linked this issue '{new_issue_id}' to parent issue '{link['outwardIssue']['key']}' with link type '{link['type']['name']}'")
 
-            i.fields.components.append({'name': g_component})
-            i.update(fields={'components': i.fields.components})
+        new_issue_ids.append(new_issue_id)
 
-        except Error as e:
-            print(f"Encountered some exception while attempting to add component '{g_component}' to JIRA issue '{new_issue_id}': {e}")
-            sys.exit(1)
-        else:
-            print(f"Added component '{g_component}' to JIRA issue '{new_issue_id}'")
+    if error_ctr > 0:
+        sys.exit(1)
 
-    if labels is not None:
+    return new_issue_ids
 
-        label_ctr = 0
-        label_str = ",".join(labels)
 
-        for label in labels:
-            label_ctr += 1
-            label = label.strip()
-            label = label.replace(' ', '-')
-            new_issue.fields.labels.append(label)
+def get_release_label(context: Dict[str, str]) -> str:
+    """Get the label that every issue of the release carries, e.g.: 'cb-1.0'."""
+    return f"{context['codebase']}-{context['version']}".strip().replace(' ', '-')
 
-        try:
-            new_issue.update(fields={'labels': new_issue.fields.labels})
-        except Error as e:
-            if label_ctr == 1:
-                print(f"Encountered some exception while attempting to add label '{label_str}' to JIRA issue '{new_issue_id}': {e}")
-            else:
-                print(f"Encountered some exception while attempting to add labels '{label_str}' to JIRA issue '{new_issue_id}': {e}")
 
-            sys.exit(1)
-        else:
-            if label_ctr == 1:
-                print(f"Added label '{label_str}' to JIRA issue '{new_issue_id}'")
-            else:
-                print(f"Added labels '{label_str}' to JIRA issue '{new_issue_id}'")
+def find_existing_issues(auth_jira: JIRA, plan: Dict[str, Any], context: Dict[str, str]) -> Dict[str, str]:
+    """Find the issues of the release plan that were already created with one query.
 
-    global g_issues
-    g_issues.append(new_issue_id)
+    An existing issue is matched to a task by the task name label.  Issues
+    created before every task carried its name label, e.g.: the
+    install-software issue that only carries 'software-release', are
+    matched by their summary instead.  The parent task's label is checked
+    last since the other tasks may carry it too.
 
-    return new_issue_id
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+        plan (Dict[str, Any]): The release plan.
+        context (Dict[str, str]): The project, code-base, version and server of the release.
+
+    Returns:
+        Dict[str, str]: The existing issue ID keyed on the task name.
+    """
+    query = f"""project = "{context['project']}" AND labels = "{get_release_label(context)}" ORDER BY key ASC"""
+    print(f"Will attempt to find the existing issues of the release with query '{query}'")
+
+    parent = plan['parent']
+    summaries = {format_template(task['summary'], context): task['name'] for task in plan['tasks'] + [parent]}
+
+    def get_task_name(issue: Any) -> Optional[str]:
+        labels = issue.fields.labels or []
+        for task in plan['tasks']:
+            if task['name'] in labels:
+                return task['name']
+        if issue.fields.summary in summaries:
+            return summaries[issue.fields.summary]
+        if parent['name'] in labels:
+            return parent['name']
+        return None
+
+    existing = {}
+    for issue in iter_search_issues(auth_jira, query, fields=['labels', 'summary']):
+        task_name = get_task_name(issue)
+        if task_name is not None:
+            # The oldest issue wins if a task was created more than once.
+            existing.setdefault(task_name, issue.key)
+
+    return existing
+
+
+def get_tasks(plan: Dict[str, Any], task_names: Tuple[str]) -> List[Dict[str, Any]]:
+    """Get the tasks from the release plan that should be created.
+
+    Args:
+        plan (Dict[str, Any]): The release plan.
+        task_names (Tuple[str]): The names of the tasks - all tasks when empty.
+
+    Raises:
+        Exception: If a name is not a task in the release plan.
+
+    Returns:
+        List[Dict[str, Any]]: The tasks, in the order of the release plan.
+    """
+    if len(task_names) == 0:
+        return plan['tasks']
+
+    known = [task['name'] for task in plan['tasks']]
+    unknown = [name for name in task_names if name not in known]
+    if len(unknown) > 0:
+        raise Exception(f"Unknown task(s) {unknown} - the release plan defines {known}")
+
+    return [task for task in plan['tasks'] if task['name'] in task_names]
 
 
 @click.command()
-@click.option('--credential_file', help='credential file containing username and password')
-@click.option('--project', help='The JIRA project key')
+@click.option('--all', is_flag=True, default=False, help="Create every task in the release plan - this is the default when --task is not specified")
+@click.option('--assignee', help=f"The assignee - default is '{DEFAULT_ASSIGNEE}'")
 @click.option('--codebase', help='The code-base')
-@click.option('--version', help='The version of the code-base')
-@click.option('--server', help='The server the code will be installed on')
-@click.option('--assignee', help='The assignee')
 @click.option('--component', help='The component')
-@click.option('--all', is_flag=True, default=False)
-def main(credential_file, project, codebase, version, server, assignee, component, all):
-    """Create the standard set of JIRA issues.
+@click.option('--credential_file', help=f"credential file containing username and password - default is '{DEFAULT_CREDENTIAL_FILE}'")
+@click.option('--max_workers', type=int, default=constants.DEFAULT_MAX_WORKERS, help=f"The number of requests to send at the same time - default is '{constants.DEFAULT_MAX_WORKERS}'")
+@click.option('--plan_file', type=click.Path(exists=True), help=f"The release plan - default is '{DEFAULT_PLAN_FILE}'")
+@click.option('--project', help=f"The JIRA project key - default is '{DEFAULT_PROJECT}'")
+@click.option('--server', help='The server the code will be installed on')
+@click.option('--task', multiple=True, help='The name of a task in the release plan to create - may be specified more than once')
+@click.option('--version', help='The version of the code-base')
+def main(all: bool, assignee: str, codebase: str, component: str, credential_file: str, max_workers: int, plan_file: str, project: str, server: str, task: Tuple[str], version: str):
+    """Create the JIRA issues of a release plan without prompting.
 
-    If executed with --all option, will create issues for all of the following:
+    The parent task is created first and every other task of the release
+    plan, or only the ones given with --task, is linked to it.  Tasks that
+    already have an issue with the '<codebase>-<version>' label are not
+    created again, so the command can be re-run after a partial failure.
+    The default release plan has the following tasks:
 
         establish release candidate
 
@@ -285,135 +412,83 @@ def main(credential_file, project, codebase, version, server, assignee, componen
         assignee = DEFAULT_ASSIGNEE
         print(f"--assignee was not specified and therefore was set to default '{assignee}'")
 
+    if plan_file is None:
+        plan_file = DEFAULT_PLAN_FILE
+        print(f"--plan_file was not specified and therefore was set to default '{plan_file}'")
+
+    try:
+        plan = load_release_plan(plan_file)
+        tasks = plan['tasks'] if all else get_tasks(plan, task)
+    except Exception as e:
+        print(f"Encountered some exception while attempting to read the release plan '{plan_file}': '{e}'")
+        sys.exit(1)
+
+    context = {
+        'project': project,
+        'issue_type': plan['issue_type'],
+        'assignee': assignee,
+        'component': component or '',
+        'codebase': codebase,
+        'version': version,
+        'server': server,
+    }
+
+    # Fail on a bad template before any issue is created.
+    try:
+        get_issue_update(plan['parent'], context)
+        for t in tasks:
+            get_issue_update(t, context)
+    except Exception as e:
+        print(f"Encountered some exception while attempting to read the release plan '{plan_file}': '{e}'")
+        sys.exit(1)
+
     with open(credential_file, 'r') as f:
         line = f.readline()
         line = line.strip()
         (username, password) = line.split(':')
         print(f"read username and password from credentials file default '{credential_file}'")
 
-    auth_jira = JIRA(url, basic_auth=(username, password))
-    if auth_jira is None:
-        print(f"Could not instantiate JIRA for url '{url}'")
+    auth_jira = get_jira_client(url, username, password, max(max_workers, constants.DEFAULT_HTTP_POOL_MAXSIZE))
+
+    # The link type does not depend on the existing issues so it is looked up at the same time.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        existing_future = executor.submit(find_existing_issues, auth_jira, plan, context)
+        link_type_future = None
+        if DEFAULT_LINK_ISSUES and len(tasks) > 0:
+            link_type_future = executor.submit(get_link_type_name, auth_jira, plan['link_type'])
+
+    try:
+        existing = existing_future.result()
+    except Exception as e:
+        print(f"Encountered some exception while attempting to find the existing issues of the release: '{e}'")
         sys.exit(1)
 
-    global g_url
-    g_url = url
-
-    global g_auth_jira
-    g_auth_jira = auth_jira
-
-    global g_project
-    g_project = project
-
-    global g_assignee
-    g_assignee = assignee
-
-    global g_codebase
-    g_codebase = codebase
-
-    global g_version
-    g_version = version
-
-    global g_server
-    g_server = server
-
-    global g_component
-    g_component = component
-
-    parent_issue_id = create_issue_software_release()
-
-    global g_parent_issue_id
-    g_parent_issue_id = parent_issue_id
-
-    if all:
-        yes_or_no_all = None
-        while yes_or_no_all is None or yes_or_no_all == "":
-            print("\nWill create new JIRA issues ALL of the following?")
-            print(" establish release candidate")
-            print(" prepare change control")
-            print(" install software")
-            print(" prepare validation documents")
-            print(" execute validation checks")
-            print(" prepare test cases")
-            print(" collect release documents")
-            yes_or_no_all = input("\nCreate new JIRA issues ALL of those? [Y/n] ")
-
-            if yes_or_no_all is None or yes_or_no_all == "":
-                yes_or_no_all = 'Y'
-            if yes_or_no_all == 'Y' or yes_or_no_all == 'y':
-                create_issue_establish_release_candidate()
-                create_issue_prepare_change_control()
-                create_issue_install_software()
-                create_issue_prepare_validation_docs()
-                create_issue_execute_validation_checks()
-                create_issue_test_cases_software()
-                create_issue_collect_release_documents()
-
-            else:
-                print("Will not create new JIRA issues for ALL of those.")
+    link_type_name = None if link_type_future is None else link_type_future.result()
+
+    new_issue_ids = []
+
+    parent_issue_id = existing.get(plan['parent']['name'])
+    if parent_issue_id is None:
+        parent_issue_id = create_issue(auth_jira, url, get_issue_update(plan['parent'], context))
+        new_issue_ids.append(parent_issue_id)
     else:
-        yes_or_no_1 = None
-        while yes_or_no_1 is None or yes_or_no_1 == '':
-            yes_or_no_1 = input("\nCreate new JIRA issue for 'establish release candidate'? [Y/n] ")
-            if yes_or_no_1 is None or yes_or_no_1 == '':
-                yes_or_no_1 = 'Y'
-            if yes_or_no_1 == 'Y' or yes_or_no_1 == 'y':
-                create_issue_establish_release_candidate()
-            else:
-                print("Will not create new JIRA issue for 'establish release candidate'")
-
-        yes_or_no_2 = None
-        while yes_or_no_2 is None or yes_or_no_2 == '':
-            yes_or_no_2 = input("\nCreate new JIRA issue for 'prepare change control'? [Y/n] ")
-            if yes_or_no_2 is None or yes_or_no_2 == '':
-                yes_or_no_2 = 'Y'
-            if yes_or_no_2 == 'Y' or yes_or_no_2 == 'y':
-                create_issue_prepare_change_control()
-            else:
-                print("Will not create new JIRA issue for 'prepare change control'")
-
-        yes_or_no_3 = None
-        while yes_or_no_3 is None or yes_or_no_3 == '':
-            yes_or_no_3 = input("\nCreate new JIRA issue for 'prepare validation documents'? [Y/n] ")
-            if yes_or_no_3 is None or yes_or_no_3 == '':
-                yes_or_no_3 = 'Y'
-            if yes_or_no_3 == 'Y' or yes_or_no_3 == 'y':
-                create_issue_prepare_validation_docs()
-            else:
-                print("Will not create new JIRA issue 'prepare validation documents'")
-
-        yes_or_no_4 = None
-        while yes_or_no_4 is None or yes_or_no_4 == '':
-            yes_or_no_4 = input("\nCreate 'execute validation checks' JIRA issue? [Y/n] ")
-            if yes_or_no_4 is None or yes_or_no_4 == '':
-                yes_or_no_4 = 'Y'
-            if yes_or_no_4 == 'Y' or yes_or_no_4 == 'y':
-                create_issue_execute_validation_checks()
-            else:
-                print("Will not create 'execute validation checks' JIRA issue")
-
-        yes_or_no_5 = None
-        while yes_or_no_5 is None or yes_or_no_5 == '':
-            yes_or_no_5 = input("\nCreate 'test cases' JIRA issue? [Y/n] ")
-            if yes_or_no_5 is None or yes_or_no_5 == '':
-                yes_or_no_5 = 'Y'
-            if yes_or_no_5 == 'Y' or yes_or_no_5 == 'y':
-                create_issue_test_cases_software()
-            else:
-                print("Will not create 'test cases' JIRA issue")
-
-        yes_or_no_6 = None
-        while yes_or_no_6 is None or yes_or_no_6 == '':
-            yes_or_no_6 = input("\nCreate 'collect release documents' JIRA issue? [Y/n] ")
-            if yes_or_no_6 is None or yes_or_no_6 == '':
-                yes_or_no_6 = 'Y'
-            if yes_or_no_6 == 'Y' or yes_or_no_6 == 'y':
-                create_issue_collect_release_documents()
-            else:
-                print("Will not create 'collect release documents' JIRA issue")
+        print(f"Found existing parent issue '{parent_issue_id}' for task '{plan['parent']['name']}'")
+
+    issue_updates = []
+    for t in tasks:
+        if t['name'] in existing:
+            print(f"Found existing issue '{existing[t['name']]}' for task '{t['name']}' and therefore will not create it")
+            continue
+        issue_updates.append(get_issue_update(t, context, parent_issue_id, link_type_name))
+
+    new_issue_ids.extend(create_issues(auth_jira, url, issue_updates, max_workers))
+
+    if len(new_issue_ids) == 0:
+        print("All of the issues of the release plan already exist")
+        return
 
     print("Remember to assign the epic link for these new JIRA issues:")
-    for issue in g_issues:
+    for issue in new_issue_ids:
         print(f"{issue}")
 
 
@@ -7,14 +7,16 @@ import sys
 import yaml
 
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from .file_utils import check_infile_status
-from .console_helper import print_red, print_yellow
-from .helper import get_auth_jira, get_rest_url
+from .console_helper import print_green, print_red, print_yellow
+from .helper import get_auth_jira, get_rest_url, get_username_password, map_search_issues
+from .mirror.manager import Manager as MirrorManager
+from .query_coalescer import search_epic_queries
+from . import constants
 from .confluence.manager import Manager as ConfluenceManager
-
-DEFAULT_PROJECT = "jira-python-utils"
+from .confluence.table_renderer import DEFAULT_MACRO_MAXIMUM_ISSUES, DEFAULT_MAX_ROWS_PER_PAGE, HTML_TABLE_COLUMNS, compile_columns, get_status_colors, render_jira_issues_macro, render_pages
 
 DEFAULT_URL_FILE = os.path.join(
     os.getenv("HOME"),
@@ -31,9 +33,7 @@ DEFAULT_CREDENTIAL_FILE = os.path.join(
 TIMESTAMP = str(datetime.today().strftime('%Y-%m-%d-%H%M%S'))
 
 DEFAULT_OUTDIR = os.path.join(
-    '/tmp/',
-    os.getenv("USER"),
-    DEFAULT_PROJECT,
+    constants.DEFAULT_OUTDIR_BASE,
     os.path.splitext(os.path.basename(__file__))[0],
     TIMESTAMP
 )
@@ -48,6 +48,14 @@ LOGGING_FORMAT = "%(levelname)s : %(asctime)s : %(pathname)s : %(lineno)d : %(me
 
 LOG_LEVEL = logging.INFO
 
+# 'macro' publishes a Jira Issues macro that Confluence keeps up to date; 'inline' publishes the issues as an HTML table.
+RENDER_MODES = ['macro', 'inline']
+
+DEFAULT_RENDER_MODE = 'macro'
+
+# Only the fields the HTML table renders are requested from Jira.
+FIELDS = [field for _, field in HTML_TABLE_COLUMNS if field is not None]
+
 
 def get_jira_epic_links(config, config_file: str) -> List[Dict[str, str]]:
     """Get the JIRA epic links from the configuration file.
@@ -76,63 +84,80 @@ def get_jira_epic_links(config, config_file: str) -> List[Dict[str, str]]:
     return links
 
 
-def create_html_content(
+def create_macro_content(
+    epic_name: str,
+    query: str,
+    config: Dict[str, Any],
+    maximum_issues: int = DEFAULT_MACRO_MAXIMUM_ISSUES) -> str:
+    """Create a Jira Issues macro for the Confluence page that shows the issues matching the query.
+
+    Args:
+        epic_name (str): The epic name.
+        query (str): The Jira jql query string.
+        config (Dict[str, Any]): The configuration object.
+        maximum_issues (int): The maximum number of issues the macro shows.
+
+    Returns:
+        str: The HTML content.
+    """
+    logging.info(f"Will add a Jira Issues macro with query '{query}' for Confluence page with title '{epic_name}'")
+
+    return render_jira_issues_macro(
+        epic_name,
+        query,
+        HTML_TABLE_COLUMNS,
+        server=config['confluence'].get('jira_server', None),
+        server_id=config['confluence'].get('jira_server_id', None),
+        maximum_issues=maximum_issues,
+    )
+
+
+def create_html_pages(
     jira_issue_base_url: str,
     epic_name: str,
     issues: List[Any],
-    config: Dict[str, Any]) -> str:
-    """Create the HTML content for the Confluence page.
+    config: Dict[str, Any],
+    max_rows_per_page: Optional[int] = DEFAULT_MAX_ROWS_PER_PAGE,
+    confluence_page_name: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Create the HTML content for the Confluence page, split into numbered child pages if the table is too large.
 
     Args:
         jira_issue_base_url (str): The JIRA issue base url.
         epic_name (str): The epic name.
         issues (List[Any]): The list of issues.
         config (Dict[str, Any]): The configuration object.
-    """
-    in_development_color = config['confluence']['status']['color_codes']['in_development']
-    done_color = config['confluence']['status']['color_codes']['done']
+        max_rows_per_page (Optional[int]): The maximum number of rows per page - None never splits the table.
+        confluence_page_name (Optional[str]): The title of the Confluence page - default is the epic name.
 
+    Returns:
+        List[Tuple[str, str]]: The title and HTML content of the page, followed by those of its child pages.
+    """
     logging.info(f"Will add '{len(issues)}' issues to the HTML table for Confluence page with title '{epic_name}'")
 
-    content = []
-    content.append(f"<html><body><h3>{epic_name}</h3>")
-    content.append("""<table>
-        <thead>
-            <tr>
-                <th>Issue</th>
-                <th>Summary</th>
-                <th>Type</th>
-                <th>Priority</th>
-                <th>Status</th>
-            </tr>
-        </thead>
-        <tbody>""")
-
-    for issue in issues:
-        content.append(f"<tr><td><a href='{jira_issue_base_url}/{issue}' target='_blank'>{issue}</a></td>")
-        content.append(f"<td>{issue.fields.summary}</td>")
-        content.append(f"<td>{issue.fields.issuetype.name}</td>")
-        content.append(f"<td>{issue.fields.priority.name}</td>")
-        status = issue.fields.status.name
-        if status.lower() == 'done':
-            content.append(f"<td style='font-weight: bold; color: {done_color}'>{status}</td></tr>")
-        elif status.lower() == 'in development':
-            content.append(f"<td style='font-weight: bold; color: {in_development_color}'>{status}</td></tr>")
-        else:
-            content.append(f"<td>{status}</td></tr>")
+    status_colors = get_status_colors(config)
+    columns = compile_columns(HTML_TABLE_COLUMNS, jira_issue_base_url, status_colors)
+
+    if confluence_page_name is None:
+        confluence_page_name = epic_name
 
-    content.append("</tbody></table></body></html>")
-    return "\n".join(content)
+    return render_pages(confluence_page_name, issues, columns, max_rows_per_page, heading=epic_name)
 
 
 @click.command()
 @click.option('--assignee', help='The assignee')
+@click.option('--coalesce/--no-coalesce', default=True, help="Combine the per-epic queries into as few searches as possible - default is to combine them")
 @click.option('--config_file', type=click.Path(exists=True), help=f"The configuration file - default is '{DEFAULT_CONFIG_FILE}'")
 @click.option('--credential_file', help='credential file containing username and password')
+@click.option('--force', is_flag=True, default=False, help="Update the Confluence pages even when their content has not changed since they were last published")
 @click.option('--logfile', help="The log file")
+@click.option('--macro_maximum_issues', type=int, help=f"The maximum number of issues each Jira Issues macro shows - default is 'macro_maximum_issues' in the 'confluence' section of the configuration file or '{DEFAULT_MACRO_MAXIMUM_ISSUES}'")
+@click.option('--max_rows_per_page', type=int, default=DEFAULT_MAX_ROWS_PER_PAGE, help=f"Tables with more rows are split into numbered child pages under an index page - default is '{DEFAULT_MAX_ROWS_PER_PAGE}'")
+@click.option('--max_workers', type=int, default=constants.DEFAULT_MAX_WORKERS, help=f"The number of epic queries to run and pages to publish at the same time - default is '{constants.DEFAULT_MAX_WORKERS}'")
 @click.option('--outdir', help=f"The default is the current working directory - default is '{DEFAULT_OUTDIR}'")
 @click.option('--query', help='The Jira jql query string')
-def main(assignee: str, config_file: str, credential_file: str, logfile: str, outdir: str, query: str):
+@click.option('--render_mode', type=click.Choice(RENDER_MODES), default=DEFAULT_RENDER_MODE, help=f"'macro' publishes a Jira Issues macro that stays live and 'inline' publishes the issues as an HTML table - default is '{DEFAULT_RENDER_MODE}'")
+@click.option('--use_mirror', is_flag=True, default=False, help=f"Sync and read the issues from the local mirror - default mirror is '{constants.DEFAULT_MIRROR_DB_FILE}'")
+def main(assignee: str, coalesce: bool, config_file: str, credential_file: str, force: bool, logfile: str, macro_maximum_issues: Optional[int], max_rows_per_page: int, max_workers: int, outdir: str, query: str, render_mode: str, use_mirror: bool):
     """Retrieve JIRA issues for epics and create Confluence pages."""
 
     rest_url_file = DEFAULT_URL_FILE
@@ -202,8 +227,26 @@ def main(assignee: str, config_file: str, credential_file: str, logfile: str, ou
 
     logging.info(f"Found '{len(links)}' epic links in the configuration file '{config_file}'")
 
-    auth_jira, auth = get_auth_jira(credential_file, url)
-
+    ctx = click.get_current_context()
+    if render_mode == 'macro':
+        if macro_maximum_issues is None:
+            macro_maximum_issues = config['confluence'].get('macro_maximum_issues', DEFAULT_MACRO_MAXIMUM_ISSUES)
+        print_yellow(f"Each Jira Issues macro shows at most '{macro_maximum_issues}' issues - use --macro_maximum_issues or --render_mode inline for larger epics")
+
+        # Confluence runs the queries, so the options for searching and splitting the tables do not apply.
+        for name in ('coalesce', 'max_rows_per_page', 'use_mirror'):
+            if ctx.get_parameter_source(name) == click.core.ParameterSource.COMMANDLINE:
+                print_yellow(f"--{name} is ignored with --render_mode macro")
+    elif macro_maximum_issues is not None:
+        print_yellow("--macro_maximum_issues is ignored with --render_mode inline")
+
+    if render_mode == 'macro':
+        # Confluence runs the queries, so only the credentials are needed to publish the pages.
+        auth = get_username_password(credential_file)
+    else:
+        auth_jira, auth = get_auth_jira(credential_file, url, max(max_workers, constants.DEFAULT_HTTP_POOL_MAXSIZE))
+
+    queries = []
     for link in links:
 
         query = link['query']
@@ -212,13 +255,40 @@ def main(assignee: str, config_file: str, credential_file: str, logfile: str, ou
             query = f"""{query} AND assignee in ({assignee})"""
             logging.info(f"Added assignee '{assignee}' to the query: {query}")
 
+        queries.append(query)
+
+    if render_mode == 'macro':
+        # Confluence runs the queries itself whenever the pages are viewed.
+        results = None
+    elif use_mirror:
+        mirror = MirrorManager(auth_jira=auth_jira, config=config, config_file=config_file)
+        results = (mirror.search_issues(q) for q in queries)
+    elif coalesce:
+        results = search_epic_queries(auth_jira, queries, max_workers, fields=FIELDS)
+    else:
+        results = map_search_issues(auth_jira, queries, max_workers, fields=FIELDS)
+
+    # One manager, and so one pool of connections, for every page.
+    manager = ConfluenceManager(
+        outdir=outdir,
+        config=config,
+        config_file=config_file,
+    )
+
+    page_sets = []
+    for link, query in zip(links, queries):
+
         epic_name = link['name']
         confluence_page_name = link['confluence_page_name']
 
+        if results is None:
+            page_sets.append([(confluence_page_name, create_macro_content(epic_name, query, config, macro_maximum_issues))])
+            continue
+
         logging.info(f"Will attempt to retrieve issues for epic '{epic_name}' with query '{query}'")
 
         try:
-            issues = auth_jira.search_issues(query)
+            issues = list(next(results))
 
         except Exception as e:
             print_red(f"Encountered some exception while attempting to query with JQL '{query}' : '{e}'")
@@ -226,25 +296,29 @@ def main(assignee: str, config_file: str, credential_file: str, logfile: str, ou
         else:
             print("Query was successful")
 
-        html_content = create_html_content(
+        page_sets.append(create_html_pages(
             jira_issue_base_url,
             epic_name,
             issues,
             config,
-        )
+            max_rows_per_page,
+            confluence_page_name,
+        ))
+
+    page_results = manager.publish_page_sets(
+        page_sets,
+        auth=auth,
+        max_workers=max_workers,
+        force=force
+    )
 
+    manager.close()
 
-        manager = ConfluenceManager(
-            outdir=outdir,
-            config=config,
-            config_file=config_file,
-        )
-
-        manager.create_page(
-            auth=auth,
-            title=confluence_page_name,
-            html_content=html_content
-        )
+    for page_result in page_results:
+        if page_result['status'] == 'error':
+            print_red(f"Could not publish page '{page_result['title']}' : '{page_result['error']}'")
+        else:
+            print_green(f"Page '{page_result['title']}' was {page_result['status']} in '{page_result['seconds']:.2f}' seconds")
 
 if __name__ == '__main__':
     main()
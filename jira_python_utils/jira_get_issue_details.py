@@ -4,7 +4,8 @@ import os
 import sys
 import click
 
-from .helper import get_jira_url, get_auth
+from . import broker
+from .helper import get_jira_url
 from .file_utils import check_infile_status
 
 from rich.console import Console
@@ -37,15 +38,13 @@ def main(credential_file: str, issue: str):
         error_console.print("issue was not specified")
         sys.exit(1)
 
-    auth_jira = get_auth(credential_file, get_jira_url(rest_url_file))
-
-    jira_issue = auth_jira.issue(issue)
-    summary = jira_issue.fields.summary
-    desc = jira_issue.fields.description
-    issue_type = jira_issue.fields.issuetype.name
-    assignee = jira_issue.fields.assignee.name
-    priority = jira_issue.fields.priority.name
-    status = jira_issue.fields.status.name
+    details = broker.run('get_issue_details', get_jira_url(rest_url_file), credential_file, issue=issue)
+    summary = details['summary']
+    desc = details['description']
+    issue_type = details['issue_type']
+    assignee = details['assignee']
+    priority = details['priority']
+    status = details['status']
 
     console.print(f"summary '{summary}'")
     console.print(f"description'{desc}'")
@@ -4,7 +4,8 @@ import os
 import sys
 import click
 
-from .helper import get_jira_url, get_auth
+from . import broker
+from .helper import get_jira_url
 from .file_utils import check_infile_status
 
 from rich.console import Console
@@ -62,22 +63,20 @@ def main(credential_file: str, child_issue: str, parent_issue: str, link_type: s
         link_type = DEFAULT_LINK_TYPE
         console.print(f"--link_type was not specified and therefore was set to default '{link_type}'")
 
-    auth_jira = get_auth(credential_file, get_jira_url(rest_url_file))
-
     console.print(f"Will attempt to link JIRA issue '{child_issue}' to '{parent_issue}' with link type '{link_type}'")
 
     try:
 
-        auth_jira.create_issue_link(
-            type=link_type,
-            inwardIssue=child_issue,
-            outwardIssue=parent_issue,
-            comment={
-                "body": f"Linking {child_issue} to {parent_issue}"
-            }
+        broker.run(
+            'link_issues',
+            get_jira_url(rest_url_file),
+            credential_file,
+            child_issue=child_issue,
+            parent_issue=parent_issue,
+            link_type=link_type
         )
 
-    except Error as e:
+    except Exception as e:
         error_console.print(f"Encountered some exception while attempting to link '{child_issue}' to '{parent_issue}' with link type '{link_type}': {e}")
         sys.exit(1)
     else:
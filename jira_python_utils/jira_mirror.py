@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Refresh the local SQLite mirror of the Jira issues matching the configured JQL queries."""
+import click
+import logging
+import os
+import pathlib
+import sys
+import yaml
+
+from typing import Optional, Tuple
+
+from .file_utils import check_infile_status
+from .helper import get_rest_url, get_auth
+from .console_helper import print_yellow, print_red, print_green
+from .mirror.manager import Manager as MirrorManager
+from . import constants
+
+
+DEFAULT_OUTDIR = os.path.join(
+    constants.DEFAULT_OUTDIR_BASE,
+    os.path.splitext(os.path.basename(__file__))[0],
+    constants.DEFAULT_TIMESTAMP
+)
+
+DEFAULT_CONFIG_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'conf',
+    'jira_mirror_config.yaml'
+)
+
+
+@click.command()
+@click.option('--config_file', type=click.Path(exists=True), help=f"The configuration file - default is '{DEFAULT_CONFIG_FILE}'")
+@click.option('--credential_file', help=f"credential file containing username and password - default is '{constants.DEFAULT_CREDENTIAL_FILE}'")
+@click.option('--db_file', help=f"The SQLite mirror file - default is '{constants.DEFAULT_MIRROR_DB_FILE}'")
+@click.option('--full', is_flag=True, default=False, help="Retrieve every matching issue instead of only the ones updated since the last sync")
+@click.option('--logfile', help="The log file")
+@click.option('--outdir', help=f"The output directory - default is '{DEFAULT_OUTDIR}'")
+@click.option('--query', multiple=True, help='A Jira jql query string to mirror - may be specified more than once')
+def main(config_file: Optional[str], credential_file: Optional[str], db_file: Optional[str], full: bool, logfile: Optional[str], outdir: Optional[str], query: Tuple[str]):
+    """Refresh the local SQLite mirror of the Jira issues matching the configured JQL queries.
+
+    Args:
+        config_file (Optional[str]): The configuration file.
+        credential_file (Optional[str]): The credential file.
+        db_file (Optional[str]): The SQLite mirror file.
+        full (bool): If true, retrieve every matching issue.
+        logfile (Optional[str]): The log file.
+        outdir (Optional[str]): The output directory.
+        query (Tuple[str]): The Jira jql query strings to mirror.
+    """
+    rest_url_file = constants.DEFAULT_URL_FILE
+    check_infile_status(rest_url_file, "txt")
+
+    url = get_rest_url(rest_url_file)
+
+    if credential_file is None:
+        credential_file = constants.DEFAULT_CREDENTIAL_FILE
+
+    check_infile_status(credential_file)
+
+    if outdir is None:
+        outdir = DEFAULT_OUTDIR
+        print_yellow(f"--outdir was not specified and therefore was set to '{outdir}'")
+
+    if not os.path.exists(outdir):
+        pathlib.Path(outdir).mkdir(parents=True, exist_ok=True)
+        print_yellow(f"Created output directory '{outdir}'")
+
+    if logfile is None:
+        logfile = os.path.join(
+            outdir,
+            os.path.splitext(os.path.basename(__file__))[0] + '.log'
+        )
+        print_yellow(f"--logfile was not specified and therefore was set to '{logfile}'")
+
+    logging.basicConfig(
+        filename=logfile,
+        format=constants.LOGGING_FORMAT,
+        level=constants.LOG_LEVEL
+    )
+
+    config = None
+    if config_file is None and os.path.exists(DEFAULT_CONFIG_FILE):
+        config_file = DEFAULT_CONFIG_FILE
+        print_yellow(f"--config_file was not specified and therefore was set to '{config_file}'")
+
+    if config_file is not None:
+        check_infile_status(config_file, "yaml")
+        logging.info(f"Loading configuration from '{config_file}'")
+        config = yaml.safe_load(pathlib.Path(config_file).read_text())
+
+    auth_jira = get_auth(credential_file, url)
+
+    manager = MirrorManager(
+        auth_jira=auth_jira,
+        config=config,
+        config_file=config_file,
+        db_file=db_file,
+    )
+
+    queries = list(query) + [q for q in manager.get_queries() if q not in query]
+    if len(queries) == 0:
+        print_red("No queries to mirror - specify --query or add 'queries' to the 'mirror' section of the configuration file")
+        sys.exit(1)
+
+    for q in queries:
+        try:
+            issue_ctr = manager.sync(q, full=full)
+        except Exception as e:
+            print_red(f"Encountered some exception while attempting to sync query '{q}' : '{e}'")
+            sys.exit(1)
+
+        print_green(f"Retrieved '{issue_ctr}' issues for query '{q}'")
+
+    manager.close()
+
+    print(f"The mirror '{manager.db_file}' is up to date")
+
+
+if __name__ == '__main__':
+    main()
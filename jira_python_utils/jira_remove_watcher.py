@@ -4,7 +4,8 @@ import os
 import sys
 import click
 
-from .helper import get_jira_url, get_auth, get_username
+from . import broker
+from .helper import get_jira_url, get_username
 from .file_utils import check_infile_status
 
 from rich.console import Console
@@ -47,11 +48,9 @@ def main(credential_file: str, username: str, issue: str):
     if username is None:
         username = get_username(credential_file)
 
-    auth_jira = get_auth(credential_file, get_jira_url(rest_url_file))
-
     console.print(f"Will attempt to remove username '{username}' from issue '{issue}'")
 
-    auth_jira.remove_watcher(issue, username)
+    broker.run('remove_watcher', get_jira_url(rest_url_file), credential_file, issue=issue, username=username)
 
     console.print(f"Removed username '{username}' from watchers for issue '{issue}'")
 
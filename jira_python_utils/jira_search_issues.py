@@ -8,18 +8,18 @@ import sys
 import yaml
 
 from datetime import datetime
-from jira import JIRA
 from typing import Optional, Tuple
 
 
-from file_utils import check_infile_status
-from helper import get_rest_url, get_auth
-from console_helper import print_yellow, print_red, print_green
+from .file_utils import check_infile_status
+from .helper import get_rest_url, get_auth, map_search_issues
+from .console_helper import print_yellow, print_red, print_green
+from .mirror.manager import Manager as MirrorManager
+from .query_coalescer import search_epic_queries
+from . import constants
 
 # query = """"Epic Link" = RGCCIDM-118 AND assignee in (jaideep.sundaram)"""
 
-DEFAULT_PROJECT = "jira-python-utils"
-
 DEFAULT_URL_FILE = os.path.join(
     os.getenv("HOME"),
     '.jira',
@@ -35,9 +35,7 @@ DEFAULT_CREDENTIAL_FILE = os.path.join(
 TIMESTAMP = str(datetime.today().strftime('%Y-%m-%d-%H%M%S'))
 
 DEFAULT_OUTDIR = os.path.join(
-    '/tmp',
-    os.getenv("USER"),
-    DEFAULT_PROJECT,
+    constants.DEFAULT_OUTDIR_BASE,
     os.path.splitext(os.path.basename(__file__))[0],
     TIMESTAMP
 )
@@ -52,26 +50,37 @@ LOGGING_FORMAT = "%(levelname)s : %(asctime)s : %(pathname)s : %(lineno)d : %(me
 
 LOG_LEVEL = logging.INFO
 
+# The Jira fields printed for each issue.
+FIELDS = ['summary', 'description', 'issuetype', 'priority', 'status']
+
 # DEFAULT_ASSIGNEE = 'jaideep.sundaram'
 
 
 @click.command()
 @click.option('--assignee', help='The assignee')
+@click.option('--coalesce/--no-coalesce', default=True, help=f"Combine the per-epic queries into as few searches as possible - a combined search holds the issues of up to '{constants.DEFAULT_COALESCE_CHUNK_SIZE}' epics in memory while the other queries stream page by page - default is to combine them")
 @click.option('--config_file', type=click.Path(exists=True), help=f"The configuration file - default is '{DEFAULT_CONFIG_FILE}'")
 @click.option('--credential_file', help='credential file containing username and password')
 @click.option('--logfile', help="The log file")
+@click.option('--max_workers', type=int, default=constants.DEFAULT_MAX_WORKERS, help=f"The number of epic queries to run at the same time - default is '{constants.DEFAULT_MAX_WORKERS}'")
 @click.option('--outdir', help=f"The default is the current working directory - default is '{DEFAULT_OUTDIR}'")
+@click.option('--page_size', type=int, default=constants.DEFAULT_SEARCH_PAGE_SIZE, help=f"The number of issues to retrieve per request - default is '{constants.DEFAULT_SEARCH_PAGE_SIZE}'")
 @click.option('--query', help='The Jira jql query string')
-def main(assignee: str, config_file: Optional[str], credential_file: Optional[str], logfile: Optional[str], outdir: Optional[str], query: str):
+@click.option('--use_mirror', is_flag=True, default=False, help=f"Sync and read the issues from the local mirror - default mirror is '{constants.DEFAULT_MIRROR_DB_FILE}'")
+def main(assignee: str, coalesce: bool, config_file: Optional[str], credential_file: Optional[str], logfile: Optional[str], max_workers: int, outdir: Optional[str], page_size: int, query: str, use_mirror: bool):
     """Retrieve issues from Jira using JQL.
 
     Args:
         assignee (str): The assignee.
+        coalesce (bool): If true, combine the per-epic queries into as few searches as possible.
         config_file (str): The configuration file.
         credential_file (str): The credential file.
         logfile (str): The log file.
+        max_workers (int): The number of epic queries to run at the same time.
         outdir (str): The output directory.
+        page_size (int): The number of issues to retrieve per request.
         query (str): The Jira jql query string.
+        use_mirror (bool): If true, sync and read the issues from the local mirror.
     """
 
     rest_url_file = DEFAULT_URL_FILE
@@ -144,8 +153,9 @@ def main(assignee: str, config_file: Optional[str], credential_file: Optional[st
 
     logging.info(f"Found '{len(links)}' epic links in the configuration file '{config_file}'")
 
-    auth_jira = get_auth(credential_file, url)
+    auth_jira = get_auth(credential_file, url, max(max_workers, constants.DEFAULT_HTTP_POOL_MAXSIZE))
 
+    queries = []
     for link in links:
 
         query = link['query']
@@ -154,13 +164,35 @@ def main(assignee: str, config_file: Optional[str], credential_file: Optional[st
             query = f"""{query} AND assignee in ({assignee})"""
             logging.info(f"Added assignee '{assignee}' to the query: {query}")
 
+        queries.append(query)
+
+    if use_mirror:
+        mirror = MirrorManager(auth_jira=auth_jira, config=config, config_file=config_file)
+        results = (mirror.search_issues(q) for q in queries)
+    elif coalesce:
+        results = search_epic_queries(auth_jira, queries, max_workers, page_size=page_size, fields=FIELDS)
+    else:
+        results = map_search_issues(auth_jira, queries, max_workers, page_size, FIELDS)
+
+    for link, query in zip(links, queries):
+
         name = link['name']
         logging.info(f"Will attempt to retrieve issues for epic '{name}' with query '{query}'")
         print(f"\n##Will attempt to retrieve issues for epic '{name}' with query '{query}'")
         # continue
 
+        issue_ctr = 0
+
         try:
-            issues = auth_jira.search_issues(query)
+            for issue in next(results):
+                issue_ctr += 1
+                print(issue)
+                # assignee = jira_issue.fields.assignee.name
+                print(f"summary '{issue.fields.summary}'")
+                print(f"description '{issue.fields.description}'")
+                print(f"issue_type '{issue.fields.issuetype.name}'")
+                print(f"priority '{issue.fields.priority.name}'")
+                print(f"status '{issue.fields.status.name}'")
 
         except Exception as e:
             print_red(f"Encountered some exception while attempting to query with JQL '{query}' : '{e}'")
@@ -168,15 +200,7 @@ def main(assignee: str, config_file: Optional[str], credential_file: Optional[st
         else:
             print("Query was successful")
 
-        print_green(f"Found '{len(issues)}' issues")
-        for issue in issues:
-            print(issue)
-            # assignee = jira_issue.fields.assignee.name
-            print(f"summary '{issue.fields.summary}'")
-            print(f"description '{issue.fields.description}'")
-            print(f"issue_type '{issue.fields.issuetype.name}'")
-            print(f"priority '{issue.fields.priority.name}'")
-            print(f"status '{issue.fields.status.name}'")
+        print_green(f"Found '{issue_ctr}' issues")
 
 
 if __name__ == '__main__':
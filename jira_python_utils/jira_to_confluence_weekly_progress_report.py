@@ -1,24 +1,29 @@
 # -*- coding: utf-8 -*-
 """Retrieve the list of resolved issues for the specified assignee between the start date and end date and create a Confluence page with the list of issues."""
+import bisect
 import click
+import itertools
+import json
 import logging
 import os
 import pathlib
 import sys
 import yaml
 
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from jira import JIRA
 from typing import Any, Dict, List, Optional, Tuple
 
 from .confluence.manager import Manager as ConfluenceManager
+from .confluence.table_renderer import DEFAULT_MAX_ROWS_PER_PAGE, HTML_TABLE_COLUMNS, compile_columns, get_status_colors, render_pages
+from .mirror.jql import UnsupportedQueryError
+from .mirror.manager import Manager as MirrorManager
 from .file_utils import check_infile_status
-from .console_helper import print_red, print_yellow
-from .helper import get_auth_jira, get_rest_url
+from .console_helper import print_green, print_red, print_yellow
+from .helper import get_auth_jira, get_rest_url, iter_search_issues
+from . import constants
 
 
-DEFAULT_PROJECT = "jira-python-utils"
-
 DEFAULT_URL_FILE = os.path.join(
     os.getenv("HOME"),
     '.jira',
@@ -34,9 +39,7 @@ DEFAULT_CREDENTIAL_FILE = os.path.join(
 DEFAULT_TIMESTAMP = str(datetime.today().strftime('%Y-%m-%d-%H%M%S'))
 
 DEFAULT_OUTDIR = os.path.join(
-    '/tmp/',
-    os.getenv('USER'),
-    DEFAULT_PROJECT,
+    constants.DEFAULT_OUTDIR_BASE,
     os.path.splitext(os.path.basename(__file__))[0],
     DEFAULT_TIMESTAMP
 )
@@ -50,8 +53,23 @@ LOGGING_FORMAT = "%(levelname)s : %(asctime)s : %(pathname)s : %(lineno)d : %(me
 
 LOG_LEVEL = logging.INFO
 
+DEFAULT_WEEK_CACHE_FILE = os.path.join(
+    os.getenv("HOME"),
+    '.jira',
+    'weekly_progress_report_cache.json'
+)
+
+# Week ranges that ended at least this many days ago no longer change.
+DEFAULT_FREEZE_AFTER_DAYS = 7
+
+# Only issues with these (lowercase) statuses are added to the report.
+REPORTED_STATUSES = {'done', 'in development', 'on hold'}
 
-def get_resolved_issues(start_date: str, end_date: str, assignee: str, auth_jira: JIRA) -> List[Any]:
+# Only the fields the HTML table renders are requested from Jira.
+FIELDS = [field for _, field in HTML_TABLE_COLUMNS if field is not None]
+
+
+def get_resolved_issues(start_date: str, end_date: str, assignee: str, auth_jira: JIRA, mirror: Optional[MirrorManager] = None, fields: List[str] = FIELDS) -> List[Any]:
     """Get the list of resolved issues for the specified assignee between the start date and end date.
 
     Args:
@@ -59,19 +77,146 @@ def get_resolved_issues(start_date: str, end_date: str, assignee: str, auth_jira
         end_date (str): The end date in the format 'YYYY-MM-DD'
         assignee (str): The assignee
         auth_jira (JIRA): The authenticated JIRA object
+        mirror (Optional[MirrorManager]): The local mirror to read the issues from
+        fields (List[str]): The fields to retrieve
     Returns:
         List[Any]: The list of resolved issues
     """
+    query = get_resolved_query(start_date, end_date, assignee)
+
+    return get_issues(query, auth_jira, mirror, fields)
+
+
+def get_resolved_query(start_date: str, end_date: str, assignee: str) -> str:
+    """Get the JQL query for the resolved issues for the specified assignee between the start date and end date.
+
+    Args:
+        start_date (str): The start date in the format 'YYYY-MM-DD'.
+        end_date (str): The end date in the format 'YYYY-MM-DD'.
+        assignee (str): The assignee.
+    Returns:
+        str: The JQL query.
+    """
     query = f"""resolved >= {start_date} AND resolved <= {end_date}"""
 
     if assignee is not None:
         query = f"""{query} AND assignee in ({assignee})"""
         logging.info(f"Added assignee '{assignee}' to the query: {query}")
 
-    return get_issues(query, auth_jira)
+    return query
+
+
+def get_week_cache_key(start_date: str, end_date: str, assignee: str) -> str:
+    """Get the key of the week range in the week cache.
+
+    Args:
+        start_date (str): The start date in the format 'YYYY-MM-DD'.
+        end_date (str): The end date in the format 'YYYY-MM-DD'.
+        assignee (str): The assignee.
+    Returns:
+        str: The key made of the assignee, the start date, the end date and the JQL query.
+    """
+    query = get_resolved_query(start_date, end_date, assignee)
+    return json.dumps([assignee, str(start_date), str(end_date), query])
+
+
+def is_frozen_week(end_date: str, freeze_after_days: int = DEFAULT_FREEZE_AFTER_DAYS) -> bool:
+    """Determine whether the week range ended long enough ago that its issues no longer change.
+
+    Args:
+        end_date (str): The end date in the format 'YYYY-MM-DD'.
+        freeze_after_days (int): The number of days after the end date that the week range is frozen.
+    Returns:
+        bool: True if the week range is frozen.
+    """
+    return date.fromisoformat(str(end_date)) <= date.today() - timedelta(days=freeze_after_days)
+
+
+def load_week_cache(cache_file: str = DEFAULT_WEEK_CACHE_FILE) -> Dict[str, Any]:
+    """Load when the frozen week ranges were published.
+
+    Args:
+        cache_file (str): The week cache file.
+    Returns:
+        Dict[str, Any]: The 'published' timestamp by week cache key.
+    """
+    if not os.path.exists(cache_file):
+        return {}
+
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read the week cache file '{cache_file}' so will ignore it: {e}")
+        return {}
+
 
+def save_week_cache(week_cache: Dict[str, Any], cache_file: str = DEFAULT_WEEK_CACHE_FILE) -> None:
+    """Write when the frozen week ranges were published.
 
-def get_in_development_issues(start_date: str, end_date: str, assignee: str, auth_jira: JIRA) -> List[Any]:
+    Args:
+        week_cache (Dict[str, Any]): The 'published' timestamp by week cache key.
+        cache_file (str): The week cache file.
+    """
+    pathlib.Path(os.path.dirname(cache_file)).mkdir(parents=True, exist_ok=True)
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(week_cache, f)
+    os.replace(tmp_file, cache_file)
+
+    logging.info(f"Wrote '{len(week_cache)}' week ranges to the week cache file '{cache_file}'")
+
+
+def get_resolved_issues_by_week(week_ranges: List[Dict[str, str]], assignee: str, auth_jira: JIRA, mirror: Optional[MirrorManager] = None) -> List[List[Any]]:
+    """Get the list of resolved issues for every week range with one query over the whole span.
+
+    Args:
+        week_ranges (List[Dict[str, str]]): The week ranges with 'start_date' and 'end_date'.
+        assignee (str): The assignee.
+        auth_jira (JIRA): The authenticated JIRA object.
+        mirror (Optional[MirrorManager]): The local mirror to read the issues from.
+    Returns:
+        List[List[Any]]: The list of resolved issues for each week range, in the same order as the week ranges.
+    """
+    start_date = min(str(week_range['start_date']) for week_range in week_ranges)
+    end_date = max(str(week_range['end_date']) for week_range in week_ranges)
+
+    issues = get_resolved_issues(
+        start_date,
+        end_date,
+        assignee,
+        auth_jira,
+        mirror,
+        FIELDS + ['resolutiondate']
+    )
+
+    # Dates and Jira's ISO timestamps compare correctly as strings, e.g.:
+    # '2023-03-03' <= '2023-03-03T10:15:00.000+0000' < '2023-03-04'.
+    order = sorted(range(len(week_ranges)), key=lambda index: str(week_ranges[index]['start_date']))
+    starts = [str(week_ranges[index]['start_date']) for index in order]
+    ends = [str(week_ranges[index]['end_date']) for index in order]
+
+    # The latest end date among the week ranges up to each position, so the
+    # backwards scan can stop once no earlier week range reaches the issue.
+    max_ends = list(itertools.accumulate(ends, max))
+
+    issues_by_week: List[List[Any]] = [[] for _ in week_ranges]
+    for issue in issues:
+        resolved = issue.fields.resolutiondate
+        if resolved is None:
+            continue
+
+        position = bisect.bisect_right(starts, resolved) - 1
+        while position >= 0 and max_ends[position] >= resolved:
+            if ends[position] >= resolved:
+                issues_by_week[order[position]].append(issue)
+            position -= 1
+
+    return issues_by_week
+
+
+def get_in_development_issues(start_date: str, end_date: str, assignee: str, auth_jira: JIRA, mirror: Optional[MirrorManager] = None) -> List[Any]:
     """Get the list of issues that are in development for the specified assignee between the start date and end date.
 
     Args:
@@ -79,6 +224,7 @@ def get_in_development_issues(start_date: str, end_date: str, assignee: str, aut
         end_date (str): The end date in the format 'YYYY-MM-DD'.
         assignee (str): The assignee.
         auth_jira (JIRA): The authenticated JIRA object.
+        mirror (Optional[MirrorManager]): The local mirror to read the issues from.
     Returns:
         List[Any]: The list of issues that are in development.
     """
@@ -88,10 +234,10 @@ def get_in_development_issues(start_date: str, end_date: str, assignee: str, aut
         query = f"""{query} AND assignee in ({assignee})"""
         logging.info(f"Added assignee '{assignee}' to the query: {query}")
 
-    return get_issues(query, auth_jira)
+    return get_issues(query, auth_jira, mirror)
 
 
-def get_on_hold_issues(start_date: str, end_date: str, assignee: str, auth_jira: JIRA) -> List[Any]:
+def get_on_hold_issues(start_date: str, end_date: str, assignee: str, auth_jira: JIRA, mirror: Optional[MirrorManager] = None) -> List[Any]:
     """Get the list of issues that are on hold for the specified assignee between the start date and end date.
 
     Args:
@@ -99,6 +245,7 @@ def get_on_hold_issues(start_date: str, end_date: str, assignee: str, auth_jira:
         end_date (str): The end date in the format 'YYYY-MM-DD'.
         assignee (str): The assignee.
         auth_jira (JIRA): The authenticated JIRA object.
+        mirror (Optional[MirrorManager]): The local mirror to read the issues from.
     Returns:
         List[Any]: The list of issues that are on hold.
     """
@@ -108,15 +255,17 @@ def get_on_hold_issues(start_date: str, end_date: str, assignee: str, auth_jira:
         query = f"""{query} AND assignee in ({assignee})"""
         logging.info(f"Added assignee '{assignee}' to the query: {query}")
 
-    return get_issues(query, auth_jira)
+    return get_issues(query, auth_jira, mirror)
 
 
-def get_issues(query: str, auth_jira: JIRA) -> List[Any]:
+def get_issues(query: str, auth_jira: JIRA, mirror: Optional[MirrorManager] = None, fields: List[str] = FIELDS) -> List[Any]:
     """Get the list of issues for the specified query.
 
     Args:
         query (str): The JQL query.
         auth_jira (JIRA): The authenticated JIRA object.
+        mirror (Optional[MirrorManager]): The local mirror to read the issues from.
+        fields (List[str]): The fields to retrieve.
 
     Returns:
         List[Any]: The list of issues.
@@ -124,7 +273,14 @@ def get_issues(query: str, auth_jira: JIRA) -> List[Any]:
     logging.info(f"Will attempt to retrieve issues with query '{query}'")
 
     try:
-        issues = auth_jira.search_issues(query)
+        if mirror is not None:
+            try:
+                issues = mirror.evaluate(query)
+            except UnsupportedQueryError as e:
+                logging.info(f"Will sync the query through the mirror since it cannot be evaluated locally: {e}")
+                issues = mirror.search_issues(query)
+        else:
+            issues = list(iter_search_issues(auth_jira, query, fields=fields))
 
     except Exception as e:
         print_red(f"Encountered some exception while attempting to query with JQL '{query}' : '{e}'")
@@ -172,78 +328,67 @@ def get_weekly_ranges(config: Dict[str, Any], config_file: str) -> List[Dict[str
     return config['jira']['weekly']
 
 
-def create_html_content(
+def create_html_pages(
     jira_issue_base_url: str,
     title: str,
     issues: List[Any],
-    config: Dict[str, Any]) -> str:
-    """Create the HTML table that will be inserted into the new Confluence
-    page.
+    config: Dict[str, Any],
+    max_rows_per_page: Optional[int] = DEFAULT_MAX_ROWS_PER_PAGE) -> List[Tuple[str, str]]:
+    """Create the HTML table for the Confluence page, split into numbered child
+    pages if the table is too large.
 
     Args:
         jira_issue_base_url (str): The JIRA issue base url.
         title (str): The title of the Confluence page.
         issues (List[Any]): The list of issues.
         config (Dict[str, Any]): The configuration object.
+        max_rows_per_page (Optional[int]): The maximum number of rows per page - None never splits the table.
     Returns:
-        str: The HTML table.
+        List[Tuple[str, str]]: The title and HTML content of the page, followed by those of its child pages.
     """
-    in_development_color = config['confluence']['status']['color_codes']['in_development']
-    done_color = config['confluence']['status']['color_codes']['done']
-
     logging.info(f"Will add '{len(issues)}' issues to the HTML table for Confluence page with title '{title}'")
 
-    content = []
-    content.append(f"<html><body><h3>{title}</h3>")
-    content.append("""<table>
-        <thead>
-            <tr>
-                <th>Issue</th>
-                <th>Summary</th>
-                <th>Type</th>
-                <th>Priority</th>
-                <th>Status</th>
-            </tr>
-        </thead>
-        <tbody>""")
+    status_colors = get_status_colors(config)
+    status_colors['on hold'] = status_colors['in development']
 
-    for issue in issues:
-        status = issue.fields.status.name
-        if status.lower() == 'in development' or status.lower() == 'done' or status.lower() == 'on hold':
-            content.append(f"<tr><td><a href='{jira_issue_base_url}/{issue}' target='_blank'>{issue}</a></td>")
-            content.append(f"<td>{issue.fields.summary}</td>")
-            content.append(f"<td>{issue.fields.issuetype.name}</td>")
-            content.append(f"<td>{issue.fields.priority.name}</td>")
-            if status.lower() == 'done':
-                content.append(f"<td style='font-weight: bold; color: {done_color}'>{status}</td></tr>")
-            elif status.lower() == 'in development':
-                content.append(f"<td style='font-weight: bold; color: {in_development_color}'>{status}</td></tr>")
-            elif status.lower() == 'on hold':
-                content.append(f"<td style='font-weight: bold; color: {in_development_color}'>{status}</td></tr>")
-            else:
-                content.append(f"<td>{status}</td></tr>")
-
-    content.append("</tbody></table></body></html>")
-    return "\n".join(content)
+    columns = compile_columns(HTML_TABLE_COLUMNS, jira_issue_base_url, status_colors)
+
+    return render_pages(title, issues, columns, max_rows_per_page, statuses=REPORTED_STATUSES)
 
 
 @click.command()
 @click.option('--assignee', help='The assignee')
 @click.option('--config_file', type=click.Path(exists=True), help=f"The configuration file - default is '{DEFAULT_CONFIG_FILE}'")
 @click.option('--credential_file', help='credential file containing username and password')
+@click.option('--force', is_flag=True, default=False, help="Update the Confluence pages even when their content has not changed since they were last published")
+@click.option('--freeze_after_days', type=int, default=DEFAULT_FREEZE_AFTER_DAYS, help=f"Week ranges that ended at least this many days ago are published once and then skipped - default is '{DEFAULT_FREEZE_AFTER_DAYS}'")
 @click.option('--logfile', help="The log file")
+@click.option('--max_rows_per_page', type=int, default=DEFAULT_MAX_ROWS_PER_PAGE, help=f"Tables with more rows are split into numbered child pages under an index page - default is '{DEFAULT_MAX_ROWS_PER_PAGE}'")
+@click.option('--max_workers', type=int, default=constants.DEFAULT_MAX_WORKERS, help=f"The number of pages to publish at the same time - default is '{constants.DEFAULT_MAX_WORKERS}'")
+@click.option('--offline', is_flag=True, default=False, help="With --use_mirror, do not sync the mirror before reading it")
 @click.option('--outdir', help=f"The default is the current working directory - default is '{DEFAULT_OUTDIR}'")
 @click.option('--query', help='The Jira jql query string')
-def main(assignee: str, config_file: Optional[str], credential_file: Optional[str], logfile: Optional[str], outdir: Optional[str], query: str):
+@click.option('--refresh_frozen', is_flag=True, default=False, help="Query and publish the frozen week ranges again")
+@click.option('--use_mirror', is_flag=True, default=False, help=f"Sync and read the issues from the local mirror - default mirror is '{constants.DEFAULT_MIRROR_DB_FILE}'")
+@click.option('--week_cache_file', help=f"The cache of the published frozen week ranges - default is '{DEFAULT_WEEK_CACHE_FILE}'")
+def main(assignee: str, config_file: Optional[str], credential_file: Optional[str], force: bool, freeze_after_days: int, logfile: Optional[str], max_rows_per_page: int, max_workers: int, offline: bool, outdir: Optional[str], query: str, refresh_frozen: bool, use_mirror: bool, week_cache_file: Optional[str]):
     """Retrieve the list of resolved issues for the specified assignee between the start date and end date and create a Confluence page with the list of issues.
 
     Args:
         assignee (str): The assignee.
         config_file (Optional[str]): The configuration file.
         credential_file (Optional[str]): The credential file.
+        force (bool): If true, update the Confluence pages even when their content has not changed.
+        freeze_after_days (int): The number of days after its end date that a week range is frozen.
         logfile (Optional[str]): The log file.
+        max_rows_per_page (int): The maximum number of rows per Confluence page.
+        max_workers (int): The number of pages to publish at the same time.
+        offline (bool): If true, do not sync the mirror before reading it.
         outdir (Optional[str]): The output directory.
         query (str): The Jira jql query string.
+        refresh_frozen (bool): If true, query and publish the frozen week ranges again.
+        use_mirror (bool): If true, sync and read the issues from the local mirror.
+        week_cache_file (Optional[str]): The cache of the published frozen week ranges.
     """
 
     rest_url_file = DEFAULT_URL_FILE
@@ -309,19 +454,58 @@ def main(assignee: str, config_file: Optional[str], credential_file: Optional[st
 
     auth_jira, auth = get_auth_jira(credential_file, url)
 
+    mirror = None
+    if use_mirror:
+        mirror = MirrorManager(auth_jira=auth_jira, config=config, config_file=config_file)
+
+        if 'mirror' not in config:
+            print_yellow(f"'mirror' section does not exist in configuration file '{config_file}' so the mirror may not hold every issue")
+
+        if not offline:
+            try:
+                mirror.refresh()
+            except Exception as e:
+                print_yellow(f"Could not sync the mirror so will use the issues from the last sync: '{e}'")
+
+    if week_cache_file is None:
+        week_cache_file = DEFAULT_WEEK_CACHE_FILE
+
+    week_cache = load_week_cache(week_cache_file)
+
+    open_week_ranges = []
     for week_range in week_ranges:
+        key = get_week_cache_key(week_range['start_date'], week_range['end_date'], assignee)
+        if not refresh_frozen and key in week_cache and is_frozen_week(week_range['end_date'], freeze_after_days):
+            logging.info(f"Week range '{week_range['start_date']}' to '{week_range['end_date']}' is frozen and was published on '{week_cache[key]['published']}'")
+            continue
+        open_week_ranges.append(week_range)
+
+    print(f"Skipping '{len(week_ranges) - len(open_week_ranges)}' frozen week ranges that were already published")
+
+    if len(open_week_ranges) == 0:
+        return
+
+    resolved_issues_by_week = get_resolved_issues_by_week(
+        open_week_ranges,
+        assignee,
+        auth_jira,
+        mirror
+    )
+
+    # One manager, and so one pool of connections, for every page.
+    manager = ConfluenceManager(
+        outdir=outdir,
+        config=config,
+        config_file=config_file,
+    )
+
+    page_sets = []
+    for week_range, resolved_issues in zip(open_week_ranges, resolved_issues_by_week):
 
         start_date = week_range['start_date']
         end_date = week_range['end_date']
         print_yellow(f"{start_date=} {end_date=}")
 
-        resolved_issues = get_resolved_issues(
-            start_date,
-            end_date,
-            assignee,
-            auth_jira
-        )
-
         # in_development_issues = get_in_development_issues(
         #     start_date,
         #     end_date,
@@ -342,24 +526,37 @@ def main(assignee: str, config_file: Optional[str], credential_file: Optional[st
 
         confluence_page_name = f"Jay's Weekly Progress Report between '{start_date}' and '{end_date}'"
 
-        html_content = create_html_content(
+        page_sets.append(create_html_pages(
             jira_issue_base_url,
             confluence_page_name,
             issues,
             config,
-        )
+            max_rows_per_page,
+        ))
+
+    page_results = manager.publish_page_sets(
+        page_sets,
+        auth=auth,
+        max_workers=max_workers,
+        force=force
+    )
 
-        manager = ConfluenceManager(
-            outdir=outdir,
-            config=config,
-            config_file=config_file,
-        )
+    manager.close()
+
+    for page_result in page_results:
+        if page_result['status'] == 'error':
+            print_red(f"Could not publish page '{page_result['title']}' : '{page_result['error']}'")
+        else:
+            print_green(f"Page '{page_result['title']}' was {page_result['status']} in '{page_result['seconds']:.2f}' seconds")
+
+    for week_range, page_result in zip(open_week_ranges, page_results):
+        if page_result['status'] != 'error' and is_frozen_week(week_range['end_date'], freeze_after_days):
+            week_cache[get_week_cache_key(week_range['start_date'], week_range['end_date'], assignee)] = {
+                'published': datetime.now().isoformat(),
+            }
+
+    save_week_cache(week_cache, week_cache_file)
 
-        manager.create_page(
-            auth=auth,
-            title=confluence_page_name,
-            html_content=html_content
-        )
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""Translate a subset of JQL into SQL over the local issue mirror.
+
+Supported are '=', '!=', 'in', '>=', '<=', '>' and '<' comparisons on the
+mirrored columns, 'AND', 'OR', parentheses and 'ORDER BY'.  Anything else,
+e.g.: functions, relative dates or 'NOT IN', raises UnsupportedQueryError so
+that the caller can send the query to the server instead.
+"""
+import re
+from typing import Any, List, Tuple
+
+# JQL field name -> column of the issues table.
+COLUMNS = {
+    'assignee': 'assignee',
+    'epic link': 'epic_link',
+    'issuekey': 'key',
+    'key': 'key',
+    'project': 'project',
+    'resolutiondate': 'resolved',
+    'resolved': 'resolved',
+    'status': 'status',
+    'updated': 'updated',
+}
+
+DATE_COLUMNS = {'resolved', 'updated'}
+
+COMPARISON_OPERATORS = {'=', '!=', '>=', '<=', '>', '<'}
+
+EMPTY_VALUES = {'empty', 'null'}
+
+TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+        |(?P<op>>=|<=|!=|=|>|<|\(|\)|,)
+        |(?P<word>[^\s=!<>(),"']+)
+    )""",
+    re.VERBOSE
+)
+
+DATE_PATTERN = re.compile(r'^\d{4}[-/]\d{1,2}[-/]\d{1,2}(?:[ T]\d{1,2}:\d{2})?$')
+
+# Key order that sorts RA-9 before RA-10.
+KEY_ORDER = "project {direction}, CAST(substr(key, instr(key, '-') + 1) AS INTEGER) {direction}"
+
+
+class UnsupportedQueryError(Exception):
+    """Raised when the query uses JQL that the mirror cannot evaluate."""
+
+
+def tokenize(query: str) -> List[Tuple[str, str]]:
+    """Split the query into (kind, value) tokens.
+
+    Args:
+        query (str): The JQL query.
+
+    Raises:
+        UnsupportedQueryError: If the query contains characters that cannot be tokenized.
+
+    Returns:
+        List[Tuple[str, str]]: The tokens where kind is 'string', 'op' or 'word'.
+    """
+    tokens = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if match is None or match.end() == position:
+            raise UnsupportedQueryError(f"Could not parse the query '{query}' at position {position}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'string':
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = tokenize(query)
+        self.position = 0
+        self.params: List[Any] = []
+
+    def peek(self) -> Tuple[str, str]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return ('end', '')
+
+    def next(self) -> Tuple[str, str]:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def is_keyword(self, keyword: str) -> bool:
+        kind, value = self.peek()
+        return kind == 'word' and value.lower() == keyword
+
+    def expect(self, kind: str, value: str) -> None:
+        token = self.next()
+        if token != (kind, value):
+            raise UnsupportedQueryError(f"Expected '{value}' but found '{token[1]}' in query '{self.query}'")
+
+    def parse(self) -> Tuple[str, str, List[Any]]:
+        where = ""
+        if not self.is_keyword('order') and self.peek()[0] != 'end':
+            where = f"WHERE {self.parse_or()}"
+
+        order_by = KEY_ORDER.format(direction='ASC')
+        if self.is_keyword('order'):
+            self.next()
+            if not self.is_keyword('by'):
+                raise UnsupportedQueryError(f"Expected 'BY' after 'ORDER' in query '{self.query}'")
+            self.next()
+            order_by = self.parse_order_by()
+
+        if self.peek()[0] != 'end':
+            raise UnsupportedQueryError(f"Unexpected '{self.peek()[1]}' in query '{self.query}'")
+
+        return where, f"ORDER BY {order_by}", self.params
+
+    def parse_or(self) -> str:
+        terms = [self.parse_and()]
+        while self.is_keyword('or'):
+            self.next()
+            terms.append(self.parse_and())
+        return terms[0] if len(terms) == 1 else "(" + " OR ".join(terms) + ")"
+
+    def parse_and(self) -> str:
+        terms = [self.parse_term()]
+        while self.is_keyword('and'):
+            self.next()
+            terms.append(self.parse_term())
+        return terms[0] if len(terms) == 1 else "(" + " AND ".join(terms) + ")"
+
+    def parse_term(self) -> str:
+        if self.peek() == ('op', '('):
+            self.next()
+            term = self.parse_or()
+            self.expect('op', ')')
+            return term
+        return self.parse_clause()
+
+    def parse_column(self) -> str:
+        kind, value = self.next()
+        if kind not in ('word', 'string') or value.lower() not in COLUMNS:
+            raise UnsupportedQueryError(f"The field '{value}' is not mirrored")
+        return COLUMNS[value.lower()]
+
+    def parse_value(self, column: str) -> Any:
+        kind, value = self.next()
+        if kind not in ('word', 'string'):
+            raise UnsupportedQueryError(f"Expected a value but found '{value}' in query '{self.query}'")
+
+        if kind == 'word' and self.peek() == ('op', '('):
+            raise UnsupportedQueryError(f"The function '{value}()' is not supported")
+
+        if kind == 'word' and value.lower() in EMPTY_VALUES:
+            return None
+
+        if column in DATE_COLUMNS:
+            if not DATE_PATTERN.match(value):
+                raise UnsupportedQueryError(f"The date '{value}' is not supported")
+            # Same layout as the stored ISO timestamps, so strings compare in date order.
+            date, _, time = value.replace('/', '-').partition(' ')
+            year, month, day = date.split('-')
+            value = f"{year}-{int(month):02d}-{int(day):02d}"
+            if time:
+                hour, minute = time.split(':')
+                value = f"{value}T{int(hour):02d}:{minute}"
+
+        return value
+
+    def parse_clause(self) -> str:
+        column = self.parse_column()
+        collate = "" if column in DATE_COLUMNS else " COLLATE NOCASE"
+
+        if self.is_keyword('in'):
+            self.next()
+            self.expect('op', '(')
+            values = [self.parse_value(column)]
+            while self.peek() == ('op', ','):
+                self.next()
+                values.append(self.parse_value(column))
+            self.expect('op', ')')
+            if None in values:
+                raise UnsupportedQueryError(f"EMPTY is not supported in a list in query '{self.query}'")
+            self.params.extend(values)
+            return f"{column}{collate} IN ({', '.join('?' * len(values))})"
+
+        kind, operator = self.next()
+        if kind != 'op' or operator not in COMPARISON_OPERATORS:
+            raise UnsupportedQueryError(f"The operator '{operator}' is not supported")
+
+        value = self.parse_value(column)
+        if value is None:
+            if operator == '=':
+                return f"{column} IS NULL"
+            if operator == '!=':
+                return f"{column} IS NOT NULL"
+            raise UnsupportedQueryError(f"EMPTY cannot be compared with '{operator}'")
+
+        self.params.append(value)
+        if operator == '!=':
+            # JQL's '!=' does not match issues where the field is empty.
+            return f"({column} IS NOT NULL AND {column} != ?{collate})"
+        return f"{column} {operator} ?{collate}"
+
+    def parse_order_by(self) -> str:
+        orders = []
+        while True:
+            column = self.parse_column()
+            direction = 'ASC'
+            if self.is_keyword('asc') or self.is_keyword('desc'):
+                direction = self.next()[1].upper()
+            if column == 'key':
+                orders.append(KEY_ORDER.format(direction=direction))
+            else:
+                orders.append(f"{column} {direction}")
+            if self.peek() != ('op', ','):
+                break
+            self.next()
+        return ", ".join(orders)
+
+
+def to_sql(query: str) -> Tuple[str, str, List[Any]]:
+    """Translate the JQL query into SQL clauses over the issues table.
+
+    Args:
+        query (str): The JQL query.
+
+    Raises:
+        UnsupportedQueryError: If the query uses JQL that the mirror cannot evaluate.
+
+    Returns:
+        Tuple[str, str, List[Any]]: The WHERE clause (may be empty), the ORDER BY clause and the parameters.
+    """
+    return _Parser(query).parse()
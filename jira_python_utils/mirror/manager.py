@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, tzinfo
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from jira import JIRA
+from jira.resources import Issue
+
+from .. import constants
+from ..helper import iter_search_issues
+from ..query_coalescer import get_epic_link_field_id
+from .jql import to_sql
+
+# The fields stored for every mirrored issue; a superset of what the reports read.
+MIRROR_FIELDS = [
+    'summary',
+    'description',
+    'issuetype',
+    'priority',
+    'status',
+    'assignee',
+    'project',
+    'labels',
+    'components',
+    'created',
+    'updated',
+    'resolutiondate',
+]
+
+# Jira only accepts minute precision in JQL date comparisons.
+JQL_DATETIME_FORMAT = '%Y/%m/%d %H:%M'
+
+SERVER_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+
+# The overlap when the watermark has to be taken from the local clock.
+LOCAL_CLOCK_OVERLAP = timedelta(days=1)
+
+# The number of mirrored keys per 'key in (...)' query of an incremental sync.
+KEY_CHUNK_SIZE = 100
+
+ORDER_BY_PATTERN = re.compile(r'\s+ORDER\s+BY\s+.*$', re.IGNORECASE | re.DOTALL)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    key TEXT PRIMARY KEY,
+    project TEXT,
+    status TEXT,
+    assignee TEXT,
+    epic_link TEXT,
+    resolved TEXT,
+    updated TEXT,
+    raw TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    jql TEXT PRIMARY KEY,
+    last_synced TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_issues (
+    jql TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (jql, key)
+);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS issues_project ON issues (project COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS issues_status ON issues (status COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS issues_assignee ON issues (assignee COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS issues_epic_link ON issues (epic_link COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS issues_resolved ON issues (resolved);
+CREATE INDEX IF NOT EXISTS issues_updated ON issues (updated);
+"""
+
+
+class Manager:
+    """Class for keeping a local SQLite mirror of Jira issues."""
+
+    def __init__(self, **kwargs):
+        """Constructor for class for keeping a local SQLite mirror of Jira issues."""
+        self.auth_jira = kwargs.get('auth_jira', None)
+        self.config = kwargs.get('config', None)
+        self.config_file = kwargs.get('config_file', None)
+
+        self.db_file = kwargs.get('db_file', None)
+        if self.db_file is None:
+            self._derive_db_file()
+
+        pathlib.Path(os.path.dirname(os.path.abspath(self.db_file))).mkdir(parents=True, exist_ok=True)
+
+        # The reports may call in from their worker threads.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        self._epic_link_field_id = None
+        self._user_timezone: Optional[tzinfo] = None
+
+        logging.info(f"Instantiated Manager in '{os.path.abspath(__file__)}' with mirror '{self.db_file}'")
+
+    def _derive_db_file(self) -> None:
+        if self.config is not None and 'mirror' in self.config and 'db_file' in self.config['mirror']:
+            self.db_file = os.path.expanduser(self.config['mirror']['db_file'])
+        else:
+            self.db_file = constants.DEFAULT_MIRROR_DB_FILE
+
+    def close(self) -> None:
+        """Close the connection to the mirror."""
+        self._conn.close()
+
+    def get_queries(self) -> List[str]:
+        """Get the JQL queries that are mirrored.
+
+        Returns:
+            List[str]: The JQL queries from the configuration file followed by the ones synced before.
+        """
+        queries = []
+        if self.config is not None and 'mirror' in self.config and 'queries' in self.config['mirror']:
+            queries.extend(self.config['mirror']['queries'])
+
+        with self._lock:
+            for row in self._conn.execute("SELECT jql FROM queries ORDER BY jql"):
+                if row['jql'] not in queries:
+                    queries.append(row['jql'])
+        return queries
+
+    def _get_epic_link_field_id(self) -> str:
+        if self._epic_link_field_id is not None:
+            return self._epic_link_field_id
+
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM settings WHERE name = 'epic_link_field_id'").fetchone()
+
+        if row is not None:
+            self._epic_link_field_id = row['value']
+        else:
+            self._epic_link_field_id = get_epic_link_field_id(self.auth_jira)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO settings (name, value) VALUES ('epic_link_field_id', ?)",
+                    (self._epic_link_field_id,)
+                )
+        return self._epic_link_field_id
+
+    def _get_user_timezone(self) -> Optional[tzinfo]:
+        if self._user_timezone is None:
+            try:
+                self._user_timezone = ZoneInfo(self.auth_jira.myself()['timeZone'])
+            except Exception as e:
+                logging.warning(f"Will read JQL dates in the server's timezone since the user's timezone is unknown: {e}")
+        return self._user_timezone
+
+    def _get_watermark(self) -> str:
+        """Get the time the next incremental sync starts from, as JQL reads it.
+
+        JQL dates are in the Jira user's timezone, so the time is taken from
+        the server and converted to that timezone.  A minute is subtracted
+        since the comparison is at minute precision.
+        """
+        try:
+            now = datetime.strptime(self.auth_jira.server_info()['serverTime'], SERVER_TIME_FORMAT)
+        except Exception as e:
+            logging.warning(f"Will take the watermark from the local clock with an overlap of '{LOCAL_CLOCK_OVERLAP}': {e}")
+            return (datetime.now() - LOCAL_CLOCK_OVERLAP).strftime(JQL_DATETIME_FORMAT)
+
+        timezone = self._get_user_timezone()
+        if timezone is not None:
+            now = now.astimezone(timezone)
+        return (now - timedelta(minutes=1)).strftime(JQL_DATETIME_FORMAT)
+
+    def sync(self, query: str, full: bool = False) -> int:
+        """Retrieve the issues matching the query that changed since the last sync.
+
+        The first sync of a query, or a full sync, retrieves every matching
+        issue and rebuilds the list of issues that belong to the query.  An
+        incremental sync also retrieves the updated issues that belonged to
+        the query, so that the ones that stopped matching are refreshed and
+        dropped from it.
+
+        Args:
+            query (str): The JQL query.
+            full (bool): If true, retrieve every matching issue.
+
+        Returns:
+            int: The number of issues that were retrieved.
+        """
+        if self.auth_jira is None:
+            raise Exception("auth_jira was not defined so the mirror cannot be synced")
+
+        with self._lock:
+            row = self._conn.execute("SELECT last_synced FROM queries WHERE jql = ?", (query,)).fetchone()
+
+        started = self._get_watermark()
+
+        incremental = row is not None and not full
+
+        jql = ORDER_BY_PATTERN.sub('', query)
+        if incremental:
+            jql = f"""({jql}) AND updated >= "{row['last_synced']}\""""
+            logging.info(f"Will attempt to retrieve issues updated since '{row['last_synced']}' with query '{jql}'")
+        else:
+            logging.info(f"Will attempt to retrieve all issues with query '{jql}'")
+
+        epic_link_field_id = self._get_epic_link_field_id()
+
+        issue_ctr = 0
+        rows = []
+        for issue in iter_search_issues(self.auth_jira, jql, fields=MIRROR_FIELDS + [epic_link_field_id]):
+            issue_ctr += 1
+            rows.append(self._to_row(issue, epic_link_field_id))
+
+        # The updated issues of the query that the delta did not return no longer match it.
+        dropped = []
+        if incremental:
+            matched = {r['key'] for r in rows}
+            with self._lock:
+                keys = [r['key'] for r in self._conn.execute("SELECT key FROM query_issues WHERE jql = ?", (query,))]
+
+            try:
+                for start in range(0, len(keys), KEY_CHUNK_SIZE):
+                    key_jql = f"""key in ({", ".join(keys[start:start + KEY_CHUNK_SIZE])}) AND updated >= "{row['last_synced']}\""""
+                    for issue in iter_search_issues(self.auth_jira, key_jql, fields=MIRROR_FIELDS + [epic_link_field_id]):
+                        if issue.key not in matched:
+                            issue_ctr += 1
+                            rows.append(self._to_row(issue, epic_link_field_id))
+                            dropped.append(issue.key)
+            except Exception as e:
+                # e.g.: a mirrored issue was deleted, which fails the whole 'key in' query.
+                logging.warning(f"Will run a full sync of query '{query}' since the mirrored issues could not be refreshed: {e}")
+                return self.sync(query, full=True)
+
+        with self._lock, self._conn:
+            if not incremental:
+                self._conn.execute("DELETE FROM query_issues WHERE jql = ?", (query,))
+            elif dropped:
+                self._conn.executemany(
+                    "DELETE FROM query_issues WHERE jql = ? AND key = ?",
+                    [(query, key) for key in dropped]
+                )
+
+            self._conn.executemany(
+                """INSERT OR REPLACE INTO issues (key, project, status, assignee, epic_link, resolved, updated, raw)
+                VALUES (:key, :project, :status, :assignee, :epic_link, :resolved, :updated, :raw)""",
+                rows
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO query_issues (jql, key) VALUES (?, ?)",
+                [(query, r['key']) for r in rows if r['key'] not in dropped]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queries (jql, last_synced) VALUES (?, ?)",
+                (query, started)
+            )
+
+            # Issues that no mirrored query matches any more, e.g.: deleted or moved issues, would still be found by evaluate.
+            purged_ctr = 0
+            if not incremental or dropped:
+                purged_ctr = self._conn.execute(
+                    "DELETE FROM issues WHERE key NOT IN (SELECT key FROM query_issues)"
+                ).rowcount
+
+        logging.info(f"Upserted '{issue_ctr}' issues into the mirror for query '{query}', dropped '{len(dropped)}' that no longer match it and purged '{purged_ctr}' that no query matches")
+        return issue_ctr
+
+    def refresh(self, full: bool = False) -> int:
+        """Sync every mirrored query.
+
+        Args:
+            full (bool): If true, retrieve every matching issue.
+
+        Returns:
+            int: The number of issues that were retrieved.
+        """
+        issue_ctr = 0
+        for query in self.get_queries():
+            issue_ctr += self.sync(query, full=full)
+        return issue_ctr
+
+    def evaluate(self, query: str) -> List[Issue]:
+        """Run the query against every issue in the mirror without contacting the server.
+
+        The mirror holds the issues of the mirrored queries as of their last
+        sync, so the answer is only complete if those queries cover every
+        issue the query could match.
+
+        Args:
+            query (str): The JQL query.
+
+        Raises:
+            UnsupportedQueryError: If the query uses JQL that the mirror cannot evaluate.
+
+        Returns:
+            List[Issue]: The issues.
+        """
+        where, order_by, params = to_sql(query)
+        logging.info(f"Will evaluate query '{query}' against the mirror with '{where} {order_by}' and {params=}")
+
+        with self._lock:
+            rows = self._conn.execute(f"SELECT raw FROM issues {where} {order_by}", params).fetchall()
+
+        return [self._to_issue(row['raw']) for row in rows]
+
+    def _to_row(self, issue: Issue, epic_link_field_id: str) -> Dict[str, Any]:
+        fields = issue.raw['fields']
+
+        def value_of(field: str, *names: str) -> Optional[str]:
+            value = fields.get(field)
+            if value is None:
+                return None
+            for name in names:
+                if value.get(name) is not None:
+                    return value[name]
+            return None
+
+        return {
+            'key': issue.key,
+            'project': value_of('project', 'key'),
+            'status': value_of('status', 'name'),
+            'assignee': value_of('assignee', 'name', 'accountId'),
+            'epic_link': fields.get(epic_link_field_id),
+            'resolved': fields.get('resolutiondate'),
+            'updated': fields.get('updated'),
+            'raw': json.dumps(issue.raw),
+        }
+
+    def search_issues(self, query: str, refresh: bool = True) -> List[Issue]:
+        """Get the issues matching the query from the mirror.
+
+        Args:
+            query (str): The JQL query.
+            refresh (bool): If true, sync the query before reading the mirror.
+
+        Returns:
+            List[Issue]: The issues.
+        """
+        if refresh:
+            self.sync(query)
+
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT issues.raw FROM issues
+                JOIN query_issues ON query_issues.key = issues.key
+                WHERE query_issues.jql = ?
+                ORDER BY issues.project, CAST(substr(issues.key, instr(issues.key, '-') + 1) AS INTEGER)""",
+                (query,)
+            ).fetchall()
+
+        return [self._to_issue(row['raw']) for row in rows]
+
+    def _to_issue(self, raw: str) -> Issue:
+        options = JIRA.DEFAULT_OPTIONS if self.auth_jira is None else self.auth_jira._options
+        session = None if self.auth_jira is None else self.auth_jira._session
+        return Issue(options, session, raw=json.loads(raw))
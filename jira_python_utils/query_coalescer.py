@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Combine per-epic JQL queries into as few searches as possible.
+
+Queries of the form '"Epic Link" = KEY' that share the rest of their clauses
+are run as a single '"Epic Link" in (KEY1, KEY2, ...)' search and the issues
+are split back into per-epic lists using the epic link field.
+"""
+from __future__ import annotations
+
+import logging
+import re
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .helper import iter_search_issues, map_search_issues
+from . import constants
+
+if TYPE_CHECKING:
+    from jira import JIRA
+
+
+EPIC_LINK_FIELD_NAME = "Epic Link"
+
+EPIC_LINK_QUERY_PATTERN = re.compile(
+    r'^\s*"Epic Link"\s*=\s*([A-Za-z][A-Za-z0-9_]*-\d+)\s*(?:AND\s+(.+?))?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def parse_epic_query(query: str) -> Optional[Tuple[str, str]]:
+    """Split a per-epic query into the epic key and the rest of its clauses.
+
+    Args:
+        query (str): The JQL query e.g.: '"Epic Link" = RA-118 AND assignee in (jsundaram)'.
+
+    Returns:
+        Optional[Tuple[str, str]]: The epic key and the remaining clauses or None if the query is not a per-epic query.
+    """
+    match = EPIC_LINK_QUERY_PATTERN.match(query)
+    if match is None:
+        return None
+
+    rest = match.group(2) or ""
+
+    # An OR would bind differently once the epic clause becomes an 'in' list.
+    if re.search(r'\bOR\b', rest, re.IGNORECASE):
+        return None
+
+    return match.group(1).upper(), rest
+
+
+def get_epic_link_field_id(auth_jira: JIRA) -> str:
+    """Look up the id of the custom field that holds the epic link.
+
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+
+    Raises:
+        Exception: If the Jira instance has no epic link field.
+
+    Returns:
+        str: The field id e.g.: 'customfield_10008'.
+    """
+    for field in auth_jira.fields():
+        if field['name'] == EPIC_LINK_FIELD_NAME:
+            logging.info(f"Found field id '{field['id']}' for field '{EPIC_LINK_FIELD_NAME}'")
+            return field['id']
+    raise Exception(f"Could not find the '{EPIC_LINK_FIELD_NAME}' field")
+
+
+def search_epic_queries(
+    auth_jira: JIRA,
+    queries: List[str],
+    max_workers: int = constants.DEFAULT_MAX_WORKERS,
+    chunk_size: int = constants.DEFAULT_COALESCE_CHUNK_SIZE,
+    page_size: int = constants.DEFAULT_SEARCH_PAGE_SIZE,
+    fields: Optional[List[str]] = None) -> Iterator[Iterable[Any]]:
+    """Run the queries, combining the compatible per-epic queries into one search.
+
+    Per-epic queries that share the rest of their clauses are combined, at most
+    chunk_size epics per search.  All other queries are run as they are.  The
+    combined searches run lazily as the results are consumed, so at most one
+    chunk of epics is held in memory.  If the Jira instance has no epic link
+    field, every query is run as it is.
+
+    Args:
+        auth_jira (JIRA): The authenticated JIRA object.
+        queries (List[str]): The JQL queries.
+        max_workers (int): The maximum number of uncombined queries to run at the same time.
+        chunk_size (int): The maximum number of epics per combined search.
+        page_size (int): The number of issues to request per page.
+        fields (Optional[List[str]]): The fields to retrieve - default is all fields.
+
+    Yields:
+        Iterator[Iterable[Any]]: The issues for each query, in query order.
+    """
+    # The remaining clauses and epic key of each per-epic query.
+    parsed: Dict[int, Tuple[str, str]] = {}
+    # The epic keys of the per-epic queries grouped by their remaining clauses.
+    groups: Dict[str, List[str]] = {}
+
+    for index, query in enumerate(queries):
+        epic_query = parse_epic_query(query)
+        if epic_query is not None:
+            epic_key, rest = epic_query
+            parsed[index] = (rest, epic_key)
+            if epic_key not in groups.setdefault(rest, []):
+                groups[rest].append(epic_key)
+
+    # Nothing is gained by combining a group of one.
+    for rest, epic_keys in list(groups.items()):
+        if len(epic_keys) == 1:
+            del groups[rest]
+    parsed = {index: value for index, value in parsed.items() if value[0] in groups}
+
+    field_id = None
+    if groups:
+        try:
+            field_id = get_epic_link_field_id(auth_jira)
+        except Exception as e:
+            logging.warning(f"Will not combine the per-epic queries: {e}")
+            parsed = {}
+            groups = {}
+
+    singles = [index for index in range(len(queries)) if index not in parsed]
+    single_results = map_search_issues(auth_jira, [queries[index] for index in singles], max_workers, page_size, fields)
+
+    # The chunk of each (remaining clauses, epic key).
+    chunks: Dict[Tuple[str, str], List[str]] = {}
+    for rest, epic_keys in groups.items():
+        for start in range(0, len(epic_keys), chunk_size):
+            chunk = epic_keys[start:start + chunk_size]
+            for epic_key in chunk:
+                chunks[(rest, epic_key)] = chunk
+
+    # The number of queries still to be yielded per (remaining clauses, epic key).
+    uses: Dict[Tuple[str, str], int] = {}
+    for value in parsed.values():
+        uses[value] = uses.get(value, 0) + 1
+
+    buckets: Dict[Tuple[str, str], List[Any]] = {}
+
+    for index in range(len(queries)):
+        if index not in parsed:
+            yield next(single_results)
+            continue
+
+        rest, epic_key = parsed[index]
+        if (rest, epic_key) not in buckets:
+            chunk = chunks[(rest, epic_key)]
+            buckets.update(_search_epic_chunk(auth_jira, rest, chunk, field_id, page_size, fields))
+
+        issues = buckets[(rest, epic_key)]
+        uses[(rest, epic_key)] -= 1
+        if uses[(rest, epic_key)] == 0:
+            del buckets[(rest, epic_key)]
+
+        yield issues
+
+
+def _search_epic_chunk(
+    auth_jira: JIRA,
+    rest: str,
+    epic_keys: List[str],
+    field_id: str,
+    page_size: int,
+    fields: Optional[List[str]]) -> Dict[Tuple[str, str], List[Any]]:
+    query = f'"{EPIC_LINK_FIELD_NAME}" in ({", ".join(epic_keys)})'
+    if rest:
+        query = f"{query} AND {rest}"
+
+    logging.info(f"Will attempt to retrieve issues for '{len(epic_keys)}' epics with query '{query}'")
+
+    buckets: Dict[str, List[Any]] = {epic_key: [] for epic_key in epic_keys}
+
+    combined_fields = None if fields is None else fields + [field_id]
+    for issue in iter_search_issues(auth_jira, query, page_size, combined_fields):
+        epic_key = getattr(issue.fields, field_id, None)
+        if epic_key is not None and epic_key.upper() in buckets:
+            buckets[epic_key.upper()].append(issue)
+
+    return {(rest, epic_key): issues for epic_key, issues in buckets.items()}
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark rendering very large issue tables for Confluence.
+
+Renders tables of synthetic issues and reports the elapsed time and the
+peak memory allocated while rendering.
+"""
+import click
+import time
+import tracemalloc
+
+from types import SimpleNamespace
+from typing import Any, Iterator
+
+from jira_python_utils.confluence.table_renderer import compile_columns, get_status_colors, render_table
+
+DEFAULT_ROWS = 100000
+
+DEFAULT_REPEATS = 3
+
+COLUMNS = [
+    ('Issue', None),
+    ('Summary', 'summary'),
+    ('Type', 'issuetype'),
+    ('Priority', 'priority'),
+    ('Status', 'status'),
+]
+
+CONFIG = {
+    'confluence': {
+        'status': {
+            'color_codes': {
+                'done': '#00FF00',
+                'in_development': '#FF8300',
+            }
+        }
+    }
+}
+
+STATUSES = ['Done', 'In Development', 'On Hold', 'To Do']
+
+
+def generate_issues(rows: int) -> Iterator[Any]:
+    for i in range(rows):
+        yield SimpleNamespace(
+            key=f"RA-{i + 1}",
+            fields=SimpleNamespace(
+                summary=f"Summary of issue {i + 1} with <markup> & \"quotes\"",
+                issuetype=SimpleNamespace(name='Task'),
+                priority=SimpleNamespace(name='Major'),
+                status=SimpleNamespace(name=STATUSES[i % len(STATUSES)]),
+            )
+        )
+
+
+@click.command()
+@click.option('--repeats', type=int, default=DEFAULT_REPEATS, help=f"The number of times to render the table - default is '{DEFAULT_REPEATS}'")
+@click.option('--rows', type=int, default=DEFAULT_ROWS, help=f"The number of issues in the table - default is '{DEFAULT_ROWS}'")
+def main(repeats: int, rows: int):
+    """Benchmark rendering very large issue tables for Confluence."""
+    columns = compile_columns(COLUMNS, "https://jira.example.com/browse", get_status_colors(CONFIG))
+
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        html_content = render_table("Benchmark", generate_issues(rows), columns)
+        seconds = time.perf_counter() - start
+        print(f"Rendered '{rows}' rows ({len(html_content) / 1e6:.1f} MB) in '{seconds:.2f}' seconds")
+
+    # Traced separately since tracing slows the rendering down.
+    tracemalloc.start()
+    render_table("Benchmark", generate_issues(rows), columns)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Peak memory while rendering '{rows}' rows was '{peak / 1e6:.1f}' MB")
+
+
+if __name__ == '__main__':
+    main()
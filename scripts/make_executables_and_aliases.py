@@ -21,6 +21,7 @@ EXECUTABLES = [
     "jira-add-component",
     "jira-add-label",
     "jira-assign-issue",
+    "jira-broker",
     "jira-convert-task-session-script-to-readme",
     "jira-create-issue",
     "jira-create-release-software-issues",
@@ -28,6 +29,7 @@ EXECUTABLES = [
     "jira-get-issue-details",
     "jira-initiate-workspace",
     "jira-link-issues",
+    "jira-mirror",
     "jira-remove-watcher",
     "jira-search-issues",
     "jira-start-task",
@@ -14,7 +14,8 @@ with open('HISTORY.rst') as history_file:
 requirements = [
     'Click>=7.0',
     "Rich",
-    "jira"
+    "jira",
+    "requests"
 ]
 
 setup_requirements = ['pytest-runner', ]
@@ -37,6 +38,7 @@ setup(
         'console_scripts': [
             "annotate-readme=jira_python_utils.annotate_readme:main",
             "bitbucket-reformat-merge-comment=jira_python_utils.bitbucket_reformat_merge_comment:main",
+            "jira-broker=jira_python_utils.broker:main",
             "jira-add-change-control-comment=jira_python_utils.jira_add_change_control_comment:main",
             "jira-add-comment=jira_python_utils.jira_add_comment:main",
             "jira-add-component=jira_python_utils.jira_add_component:main",
@@ -49,6 +51,7 @@ setup(
             "jira-get-issue-details=jira_python_utils.jira_get_issue_details:main",
             "jira-initiate-workspace=jira_python_utils.jira_initiate_workspace:main",
             "jira-link-issues=jira_python_utils.jira_link_issues:main",
+            "jira-mirror=jira_python_utils.jira_mirror:main",
             "jira-remove-watcher=jira_python_utils.jira_remove_watcher:main",
             "jira-search-issues=jira_python_utils.jira_search_issues:main",
             "jira-start-task=jira_python_utils.jira_start_task:main",
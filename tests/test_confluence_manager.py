@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""Tests for `jira_python_utils.confluence.manager`."""
+import itertools
+import json
+
+import pytest
+
+from jira_python_utils.confluence.manager import Manager
+from jira_python_utils.confluence.table_renderer import get_part_title
+
+
+REST_API_URL = 'https://confluence.example.com/rest/api/content'
+
+PARENT_PAGE_ID = '1'
+
+
+class FakeResponse:
+    """A response with the status code and JSON body of the Confluence REST API."""
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """An in-memory Confluence space that records every request."""
+
+    def __init__(self, child_page_limit=None):
+        self.pages = {PARENT_PAGE_ID: {'title': 'Parent', 'version': 1, 'parent': None, 'body': ''}}
+        self.requests = []
+        self.child_page_limit = child_page_limit
+        # The number of the next updates that another editor wins.
+        self.conflicts = 0
+        self._page_ids = itertools.count(101)
+
+    def add_page(self, title, parent=PARENT_PAGE_ID, version=1, body=''):
+        pid = str(next(self._page_ids))
+        self.pages[pid] = {'title': title, 'version': version, 'parent': parent, 'body': body}
+        return pid
+
+    def get(self, url, headers=None, auth=None, params=None, timeout=None):
+        path = url[len(REST_API_URL):]
+        if path.endswith('/child/page'):
+            self.requests.append(('GET', path, params['start']))
+            parent = path.split('/')[1]
+            children = [
+                {'id': pid, 'title': page['title'], 'version': {'number': page['version']}}
+                for pid, page in self.pages.items() if page['parent'] == parent
+            ]
+            limit = params['limit'] if self.child_page_limit is None else self.child_page_limit
+            results = children[params['start']:params['start'] + limit]
+            links = {'next': '...'} if params['start'] + limit < len(children) else {}
+            return FakeResponse(200, {'results': results, '_links': links})
+
+        self.requests.append(('GET', path))
+        if path:
+            page = self.pages[path.lstrip('/')]
+            return FakeResponse(200, {'id': path.lstrip('/'), 'version': {'number': page['version']}})
+
+        results = [
+            {'id': pid, 'version': {'number': page['version']}}
+            for pid, page in self.pages.items() if page['title'] == params['title']
+        ]
+        return FakeResponse(200, {'results': results})
+
+    def post(self, url, headers=None, auth=None, json=None, timeout=None):
+        self.requests.append(('POST', json['title']))
+        pid = self.add_page(json['title'], parent=str(json['ancestors'][0]['id']))
+        return FakeResponse(200, {'id': pid, 'version': {'number': 1}})
+
+    def put(self, url, headers=None, auth=None, json=None, timeout=None):
+        pid = url.split('/')[-1]
+        self.requests.append(('PUT', pid, json['version']['number']))
+        if pid not in self.pages:
+            return FakeResponse(404, {'statusCode': 404})
+
+        page = self.pages[pid]
+        if self.conflicts > 0:
+            self.conflicts -= 1
+            page['version'] += 1
+        if json['version']['number'] != page['version'] + 1:
+            return FakeResponse(409, {'statusCode': 409})
+
+        page['version'] = json['version']['number']
+        page['body'] = json['body']['storage']['value']
+        return FakeResponse(200, {'id': pid, 'version': {'number': page['version']}})
+
+    def delete(self, url, auth=None, timeout=None):
+        pid = url.split('/')[-1]
+        self.requests.append(('DELETE', pid))
+        del self.pages[pid]
+        return FakeResponse(204, {})
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def session():
+    return FakeSession()
+
+
+def create_manager(session, tmp_path):
+    """Create a manager that publishes under the parent page through the fake session, as a new run would."""
+    return Manager(
+        rest_api_url=REST_API_URL,
+        parent_page_id=PARENT_PAGE_ID,
+        space_key='RA',
+        config={'confluence': {'home_space': 'RA'}},
+        page_cache_file=str(tmp_path / 'page_cache.json'),
+        session=session,
+    )
+
+
+@pytest.fixture
+def manager(session, tmp_path):
+    return create_manager(session, tmp_path)
+
+
+def test_create_page_skips_unchanged_content(manager, session):
+    """A page is only sent to Confluence again when its storage body changed or force is set."""
+    assert manager.create_page(title='Epic', html_content='<p>1</p>') == 'updated'
+
+    session.requests.clear()
+    assert manager.create_page(title='Epic', html_content='<p>1</p>') == 'unchanged'
+    assert session.requests == []
+
+    assert manager.create_page(title='Epic', html_content='<p>1</p>', force=True) == 'updated'
+    assert manager.create_page(title='Epic', html_content='<p>2</p>') == 'updated'
+    assert [request[0] for request in session.requests] == ['PUT', 'PUT']
+
+
+def test_default_session_is_pooled_and_retries_only_gets_and_puts(tmp_path):
+    """The manager's own session keeps pool_maxsize connections and never retries a POST that may have created a page."""
+    manager = Manager(
+        rest_api_url=REST_API_URL,
+        parent_page_id=PARENT_PAGE_ID,
+        space_key='RA',
+        page_cache_file=str(tmp_path / 'page_cache.json'),
+        pool_maxsize=7,
+        max_retries=2,
+    )
+
+    adapter = manager.session.get_adapter(REST_API_URL)
+    assert adapter._pool_maxsize == 7
+    assert adapter.max_retries.total == 2
+    assert set(adapter.max_retries.allowed_methods) == {'GET', 'PUT'}
+    assert {429, 503} <= set(adapter.max_retries.status_forcelist)
+
+    manager.close()
+
+
+def test_update_page_retries_once_on_conflict(manager, session):
+    """A 409 looks the version up again and retries the update once; a second 409 fails the update."""
+    pid = session.add_page('Epic', version=3)
+
+    session.conflicts = 1
+    assert manager.update_page(pid, {}, None, 'Epic', '<p>1</p>', current_version=3) == 5
+    assert session.requests == [('PUT', pid, 4), ('GET', f'/{pid}'), ('PUT', pid, 5)]
+    assert session.pages[pid]['body'] == '<p>1</p>'
+
+    session.requests.clear()
+    session.conflicts = 2
+    assert manager.update_page(pid, {}, None, 'Epic', '<p>2</p>', current_version=5) is None
+    assert [request[0] for request in session.requests] == ['PUT', 'GET', 'PUT']
+    assert session.pages[pid]['body'] == '<p>1</p>'
+
+
+def test_create_page_puts_to_the_cached_page_and_version(session, tmp_path):
+    """A published page is updated with one PUT to its cached ID and version and only looked up when that fails."""
+    create_manager(session, tmp_path).create_page(title='Epic', html_content='<p>1</p>')
+    pid, = [pid for pid, page in session.pages.items() if page['title'] == 'Epic']
+
+    session.requests.clear()
+    assert create_manager(session, tmp_path).create_page(title='Epic', html_content='<p>2</p>') == 'updated'
+    assert session.requests == [('PUT', pid, 3)]
+
+    # Someone else edited the page, so the cached version is stale.
+    session.pages[pid]['version'] += 1
+    session.requests.clear()
+    assert create_manager(session, tmp_path).create_page(title='Epic', html_content='<p>3</p>') == 'updated'
+    assert session.requests == [('PUT', pid, 4), ('GET', f'/{PARENT_PAGE_ID}/child/page', 0), ('PUT', pid, 5)]
+
+    # Someone else deleted the page, so it is created again.
+    del session.pages[pid]
+    session.requests.clear()
+    assert create_manager(session, tmp_path).create_page(title='Epic', html_content='<p>4</p>') == 'updated'
+    assert [request[0] for request in session.requests] == ['PUT', 'GET', 'GET', 'POST', 'PUT']
+    assert [page['body'] for page in session.pages.values() if page['title'] == 'Epic'] == ['<p>4</p>']
+
+
+def test_get_child_pages_follows_every_page_of_the_listing(tmp_path):
+    """The children are listed page by page once per parent page, with their versions."""
+    session = FakeSession(child_page_limit=2)
+    pids = [session.add_page(f'Epic {n}', version=n) for n in range(1, 6)]
+    manager = create_manager(session, tmp_path)
+
+    child_pages = manager.get_child_pages(None)
+
+    assert child_pages == {f'Epic {n}': {'id': pid, 'version': n} for n, pid in enumerate(pids, start=1)}
+    assert session.requests == [('GET', f'/{PARENT_PAGE_ID}/child/page', start) for start in (0, 2, 4)]
+
+    session.requests.clear()
+    assert manager.get_child_pages(None) is child_pages
+    assert session.requests == []
+
+
+def test_publish_pages_reports_each_page_in_job_order(manager, session):
+    """Pages are published concurrently and a failed page does not stop the others."""
+    manager.create_page(title='Epic 2', html_content='<p>2</p>')
+    jobs = [(f'Epic {n}', f'<p>{n}</p>') for n in range(1, 6)]
+    jobs[3] = ('Epic 4', None)
+
+    results = manager.publish_pages(jobs, max_workers=3)
+
+    assert [(result['title'], result['status']) for result in results] == [
+        ('Epic 1', 'updated'),
+        ('Epic 2', 'unchanged'),
+        ('Epic 3', 'updated'),
+        ('Epic 4', 'error'),
+        ('Epic 5', 'updated'),
+    ]
+    assert results[3]['error'] == 'html_content was not define'
+    assert all(result['error'] is None for index, result in enumerate(results) if index != 3)
+    assert all(result['seconds'] >= 0 for result in results)
+    assert sorted(page['title'] for page in session.pages.values() if page['parent'] == PARENT_PAGE_ID) == ['Epic 1', 'Epic 2', 'Epic 3', 'Epic 5']
+
+
+def get_page_set(title, part_ctr):
+    if part_ctr == 0:
+        return [(title, '<p>table</p>')]
+    return [(title, f'<p>index of {part_ctr}</p>')] + [(get_part_title(title, part), f'<p>part {part}</p>') for part in range(1, part_ctr + 1)]
+
+
+def get_children(session, title):
+    pid, = [pid for pid, page in session.pages.items() if page['title'] == title]
+    return sorted(page['title'] for page in session.pages.values() if page['parent'] == pid)
+
+
+def test_publish_page_sets_publishes_parts_under_their_index_page(session, tmp_path):
+    """The parts of a split table are children of its index page and the set reports one status."""
+    results = create_manager(session, tmp_path).publish_page_sets([get_page_set('Epic', 3), get_page_set('Other', 0)], max_workers=2)
+
+    assert [(result['title'], result['status']) for result in results] == [('Epic', 'updated'), ('Other', 'updated')]
+    assert get_children(session, 'Parent') == ['Epic', 'Other']
+    assert get_children(session, 'Epic') == ['Epic - Part 1', 'Epic - Part 2', 'Epic - Part 3']
+
+    # Only a changed part is published again and it makes its set 'updated'.
+    page_set = get_page_set('Epic', 3)
+    page_set[2] = (page_set[2][0], '<p>part 2 changed</p>')
+    session.requests.clear()
+    results = create_manager(session, tmp_path).publish_page_sets([page_set, get_page_set('Other', 0)], max_workers=2)
+
+    assert [result['status'] for result in results] == ['updated', 'unchanged']
+    assert [request[0] for request in session.requests] == ['PUT']
+
+
+def test_publish_page_sets_reports_a_failed_part(session, tmp_path):
+    """A part that fails makes its whole set an error."""
+    page_set = get_page_set('Epic', 2)
+    page_set[2] = (page_set[2][0], None)
+
+    result, = create_manager(session, tmp_path).publish_page_sets([page_set])
+
+    assert result['status'] == 'error'
+    assert result['error'] == "page 'Epic - Part 2': html_content was not define"
+
+
+def test_publish_page_sets_deletes_stale_parts(session, tmp_path):
+    """Parts beyond the new last part of a table that shrank are deleted and forgotten."""
+    create_manager(session, tmp_path).publish_page_sets([get_page_set('Epic', 3)])
+    session.add_page('Epic - Notes', parent=[pid for pid, page in session.pages.items() if page['title'] == 'Epic'][0])
+
+    result, = create_manager(session, tmp_path).publish_page_sets([get_page_set('Epic', 1)])
+
+    assert result['status'] == 'updated'
+    assert get_children(session, 'Epic') == ['Epic - Notes', 'Epic - Part 1']
+
+    manager = create_manager(session, tmp_path)
+    assert manager.get_cached_page('Epic - Part 2') is None
+
+    # The table is no longer split, so its last part goes too.
+    manager.publish_page_sets([get_page_set('Epic', 0)])
+    assert get_children(session, 'Epic') == ['Epic - Notes']
+
+    # Nothing is listed once no stale part is left in the page cache.
+    session.requests.clear()
+    result, = create_manager(session, tmp_path).publish_page_sets([get_page_set('Epic', 0)])
+    assert result['status'] == 'unchanged'
+    assert session.requests == []
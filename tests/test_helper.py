@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Tests for `jira_python_utils.helper`."""
+import json
+
+from types import SimpleNamespace
+
+import pytest
+
+from jira.exceptions import JIRAError
+
+from jira_python_utils.helper import bulk_create_issues
+
+
+def get_issue_updates(count):
+    return [{'fields': {'summary': f'task {n}'}} for n in range(count)]
+
+
+class FakeJira:
+    """Answer the bulk create request with the body, or raise the error, it was given."""
+
+    def __init__(self, body=None, error=None):
+        self.body = body
+        self.error = error
+        self.requests = []
+        self._session = SimpleNamespace(post=self.post)
+
+    def _get_url(self, path):
+        return f'https://jira.example.com/rest/api/2/{path}'
+
+    def post(self, url, data):
+        self.requests.append((url, json.loads(data)))
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(text=json.dumps(self.body))
+
+
+def test_bulk_create_issues_sends_one_request():
+    """Every issue update goes into one request to the bulk endpoint and the keys come back in order."""
+    auth_jira = FakeJira({'issues': [{'key': 'RA-1'}, {'key': 'RA-2'}], 'errors': []})
+
+    assert bulk_create_issues(auth_jira, get_issue_updates(2)) == [
+        {'key': 'RA-1', 'error': None},
+        {'key': 'RA-2', 'error': None},
+    ]
+    assert auth_jira.requests == [('https://jira.example.com/rest/api/2/issue/bulk', {'issueUpdates': get_issue_updates(2)})]
+
+
+def test_bulk_create_issues_maps_errors_to_their_issue_updates():
+    """The failed elements are matched by their number and the created issues fill the remaining positions in order."""
+    element_errors = {'errors': {'assignee': 'User does not exist'}}
+    auth_jira = FakeJira({
+        'issues': [{'key': 'RA-1'}, {'key': 'RA-2'}],
+        'errors': [{'failedElementNumber': 1, 'elementErrors': element_errors}],
+    })
+
+    assert bulk_create_issues(auth_jira, get_issue_updates(3)) == [
+        {'key': 'RA-1', 'error': None},
+        {'key': None, 'error': element_errors},
+        {'key': 'RA-2', 'error': None},
+    ]
+
+
+def test_bulk_create_issues_when_every_issue_fails():
+    """Jira answers 400 when no issue was created and every issue update gets its error."""
+    body = {
+        'issues': [],
+        'errors': [{'failedElementNumber': n, 'elementErrors': {'errors': {'project': 'invalid'}}} for n in range(2)],
+    }
+    response = SimpleNamespace(text=json.dumps(body))
+    auth_jira = FakeJira(error=JIRAError(status_code=400, response=response))
+
+    assert bulk_create_issues(auth_jira, get_issue_updates(2)) == [
+        {'key': None, 'error': {'errors': {'project': 'invalid'}}},
+        {'key': None, 'error': {'errors': {'project': 'invalid'}}},
+    ]
+
+
+def test_bulk_create_issues_raises_other_errors():
+    """Errors other than a 400 with a body are raised."""
+    auth_jira = FakeJira(error=JIRAError(status_code=503))
+
+    with pytest.raises(JIRAError):
+        bulk_create_issues(auth_jira, get_issue_updates(1))
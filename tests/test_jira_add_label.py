@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Tests for `jira_python_utils.jira_add_label`."""
+import io
+
+from types import SimpleNamespace
+
+import pytest
+
+from click.testing import CliRunner
+
+from jira_python_utils import jira_add_label
+
+
+def test_get_issue_ids():
+    """--issue comes first and --issues may be separated by commas or whitespace, without duplicates."""
+    assert jira_add_label.get_issue_ids('RA-1', 'RA-2, RA-3\nRA-1 RA-4,,RA-2') == ['RA-1', 'RA-2', 'RA-3', 'RA-4']
+    assert jira_add_label.get_issue_ids(None, 'RA-2') == ['RA-2']
+    assert jira_add_label.get_issue_ids('RA-1', None) == ['RA-1']
+
+
+def test_get_issue_ids_from_stdin(monkeypatch):
+    """--issues '-' reads the issues from stdin, e.g.: piped from another command."""
+    monkeypatch.setattr('sys.stdin', io.StringIO('RA-1\nRA-2\n\nRA-1\n'))
+
+    assert jira_add_label.get_issue_ids(None, '-') == ['RA-1', 'RA-2']
+
+
+@pytest.fixture
+def labelled(monkeypatch):
+    """Replace the Jira calls of the batch path and record the labels added to each issue."""
+    labelled = {}
+
+    def add_labels(auth_jira, issue, labels):
+        if issue == 'RA-2':
+            raise Exception('Issue does not exist')
+        labelled[issue] = labels
+
+    monkeypatch.setattr(jira_add_label, 'check_infile_status', lambda *args: None)
+    monkeypatch.setattr(jira_add_label, 'get_jira_url', lambda *args: 'https://jira.example.com')
+    monkeypatch.setattr(jira_add_label, 'get_auth', lambda *args: object())
+    monkeypatch.setattr(jira_add_label, 'iter_search_issues', lambda auth_jira, query, fields: [SimpleNamespace(key=key) for key in ('RA-3', 'RA-1')])
+    monkeypatch.setattr(jira_add_label, 'add_labels', add_labels)
+    return labelled
+
+
+def test_add_labels_to_issues(labelled):
+    """Every issue is labelled and a failure is reported against its issue, in order."""
+    errors = jira_add_label.add_labels_to_issues(object(), ['RA-1', 'RA-2', 'RA-3'], ['a', 'b'], max_workers=2)
+
+    assert errors == {'RA-1': None, 'RA-2': 'Issue does not exist', 'RA-3': None}
+    assert labelled == {'RA-1': ['a', 'b'], 'RA-3': ['a', 'b']}
+
+
+def test_main_reports_every_issue(labelled):
+    """The issues from --issues and --jql are labelled once each and the command fails if any issue failed."""
+    result = CliRunner().invoke(jira_add_label.main, ['--issues', 'RA-1,RA-2', '--jql', 'project = RA', '--label', 'a,b'])
+
+    assert result.exit_code == 1
+    assert "Added label(s) 'a,b' to issue 'RA-1'" in result.output
+    assert "Could not add label(s) 'a,b' to issue 'RA-2': Issue does not exist" in result.output
+    assert "Added label(s) 'a,b' to issue 'RA-3'" in result.output
+    assert "Added label(s) 'a,b' to '2' of '3' issues" in result.output
+    assert labelled == {'RA-1': ['a', 'b'], 'RA-3': ['a', 'b']}
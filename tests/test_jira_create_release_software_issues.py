@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Tests for `jira_python_utils.jira_create_release_software_issues`."""
+import os
+
+from types import SimpleNamespace
+
+import pytest
+
+from jira_python_utils.jira_create_release_software_issues import find_existing_issues, load_release_plan
+
+
+PLAN_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'conf', 'jira_release_plan.yaml')
+
+CONTEXT = {
+    'project': 'RA',
+    'issue_type': 'Task',
+    'assignee': 'jsundaram',
+    'component': '',
+    'codebase': 'cb',
+    'version': '1.0',
+    'server': 'srv',
+}
+
+
+class Page(list):
+    """A page of search results with the total that Jira reports."""
+
+    total = 0
+
+
+class FakeJira:
+    """Answer every search with the issues it was given, oldest first."""
+
+    def __init__(self, issues):
+        self.issues = issues
+        self.queries = []
+
+    def search_issues(self, query, startAt, maxResults, fields):
+        self.queries.append((query, fields))
+        page = Page(self.issues[startAt:startAt + maxResults])
+        page.total = len(self.issues)
+        return page
+
+
+def create_issue(key, labels, summary):
+    return SimpleNamespace(key=key, fields=SimpleNamespace(labels=labels, summary=summary))
+
+
+@pytest.fixture
+def plan():
+    return load_release_plan(PLAN_FILE)
+
+
+def test_find_existing_issues(plan):
+    """Issues match by task label, then by summary, then by the parent label, and the oldest issue of a task wins."""
+    auth_jira = FakeJira([
+        # The parent issue, renamed after it was created.
+        create_issue('RA-1', ['software-release', 'install-server:srv', 'cb-1.0', 'cb'], 'release cb 1.0'),
+        # An install-software issue from before the tasks carried their name label.
+        create_issue('RA-2', ['software-release', 'install-server:srv', 'cb-1.0', 'cb'], 'install software release for cb 1.0 on srv'),
+        create_issue('RA-3', ['test-cases', 'cb-1.0', 'cb'], 'renamed test cases'),
+        create_issue('RA-4', ['test-cases', 'cb-1.0', 'cb'], 'test cases for cb 1.0'),
+        create_issue('RA-5', ['cb-1.0'], 'something else'),
+        # The task label wins over the parent label that the task also carries.
+        create_issue('RA-6', ['software-release', 'prepare-change-control', 'cb-1.0'], 'renamed change control'),
+    ])
+
+    assert find_existing_issues(auth_jira, plan, CONTEXT) == {
+        'software-release': 'RA-1',
+        'install-software': 'RA-2',
+        'test-cases': 'RA-3',
+        'prepare-change-control': 'RA-6',
+    }
+    assert auth_jira.queries == [('project = "RA" AND labels = "cb-1.0" ORDER BY key ASC', 'labels,summary')]
+
+
+def test_find_existing_issues_without_issues(plan):
+    """Nothing exists before the release plan was run."""
+    assert find_existing_issues(FakeJira([]), plan, CONTEXT) == {}
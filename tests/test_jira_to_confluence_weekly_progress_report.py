@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Tests for `jira_python_utils.jira_to_confluence_weekly_progress_report`."""
+from types import SimpleNamespace
+
+from jira_python_utils import jira_to_confluence_weekly_progress_report as report
+
+
+def make_issue(key, resolved):
+    return SimpleNamespace(key=key, fields=SimpleNamespace(resolutiondate=resolved))
+
+
+def test_get_resolved_issues_by_week_with_overlapping_ranges(monkeypatch):
+    """Every issue lands in each week range that contains it, with one query over the whole span."""
+    issues = [
+        make_issue('RA-1', '2023-03-06T10:00:00.000+0000'),
+        make_issue('RA-2', '2023-03-11T10:00:00.000+0000'),
+        # JQL's 'resolved <= 2023-03-08' ends at the start of that day.
+        make_issue('RA-3', '2023-03-08T10:00:00.000+0000'),
+        make_issue('RA-4', '2023-03-20T10:00:00.000+0000'),
+        make_issue('RA-5', None),
+    ]
+
+    queries = []
+
+    def get_resolved_issues(start_date, end_date, assignee, auth_jira, mirror=None, fields=None):
+        queries.append((start_date, end_date, assignee))
+        return issues
+
+    monkeypatch.setattr(report, 'get_resolved_issues', get_resolved_issues)
+
+    # Deliberately not in date order.
+    week_ranges = [
+        {'start_date': '2023-03-10', 'end_date': '2023-03-17'},
+        {'start_date': '2023-03-01', 'end_date': '2023-03-08'},
+        {'start_date': '2023-03-05', 'end_date': '2023-03-12'},
+    ]
+
+    issues_by_week = report.get_resolved_issues_by_week(week_ranges, 'jsundaram', None)
+
+    assert queries == [('2023-03-01', '2023-03-17', 'jsundaram')]
+    assert [[issue.key for issue in week] for week in issues_by_week] == [
+        ['RA-2'],
+        ['RA-1'],
+        ['RA-1', 'RA-2', 'RA-3'],
+    ]
+
+
+def test_get_resolved_issues_by_week_with_a_range_inside_another(monkeypatch):
+    """A short range nested inside a long one does not hide the long one from later issues."""
+    issues = [
+        make_issue('RA-1', '2023-03-03T10:00:00.000+0000'),
+        make_issue('RA-2', '2023-03-20T10:00:00.000+0000'),
+    ]
+    monkeypatch.setattr(report, 'get_resolved_issues', lambda *args, **kwargs: issues)
+
+    week_ranges = [
+        {'start_date': '2023-03-01', 'end_date': '2023-03-31'},
+        {'start_date': '2023-03-02', 'end_date': '2023-03-04'},
+    ]
+
+    issues_by_week = report.get_resolved_issues_by_week(week_ranges, None, None)
+
+    assert [[issue.key for issue in week] for week in issues_by_week] == [['RA-1', 'RA-2'], ['RA-1']]
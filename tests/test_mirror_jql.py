@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Tests for `jira_python_utils.mirror.jql`."""
+import sqlite3
+
+import pytest
+
+from jira_python_utils.mirror.jql import UnsupportedQueryError, to_sql
+
+
+ISSUES = [
+    # key, project, status, assignee, resolved, updated
+    ('RA-10', 'RA', 'Done', 'jsundaram', '2023-03-02T10:15:00.000+0000', '2023-03-02T10:15:00.000+0000'),
+    ('RA-9', 'RA', 'In Development', 'jsundaram', None, '2023-03-04T09:00:00.000+0000'),
+    ('RA-2', 'RA', 'To Do', None, None, '2023-03-01T08:00:00.000+0000'),
+    ('PTB-1', 'PTB', 'Done', 'someone', '2023-03-06T12:00:00.000+0000', '2023-03-06T12:00:00.000+0000'),
+]
+
+
+@pytest.fixture
+def conn():
+    """An in-memory issues table with the mirror's columns."""
+    conn = sqlite3.connect(':memory:')
+    conn.execute(
+        """CREATE TABLE issues (
+            key TEXT PRIMARY KEY,
+            project TEXT,
+            status TEXT,
+            assignee TEXT,
+            epic_link TEXT,
+            resolved TEXT,
+            updated TEXT
+        )"""
+    )
+    conn.executemany(
+        "INSERT INTO issues (key, project, status, assignee, resolved, updated) VALUES (?, ?, ?, ?, ?, ?)",
+        ISSUES
+    )
+    yield conn
+    conn.close()
+
+
+def select_keys(conn, query):
+    where, order_by, params = to_sql(query)
+    return [row[0] for row in conn.execute(f"SELECT key FROM issues {where} {order_by}", params)]
+
+
+def test_comparison_and_in(conn):
+    """'=' and 'in' compare case-insensitively and 'AND' binds tighter than 'OR'."""
+    assert select_keys(conn, 'project = ra AND status in ("to do", DONE)') == ['RA-2', 'RA-10']
+    assert select_keys(conn, 'project = PTB OR project = RA AND status = Done') == ['PTB-1', 'RA-10']
+    assert select_keys(conn, '(project = PTB OR project = RA) AND status = Done') == ['PTB-1', 'RA-10']
+
+
+def test_empty(conn):
+    """'= EMPTY' and '!= EMPTY' test for a missing value."""
+    assert select_keys(conn, 'assignee = EMPTY') == ['RA-2']
+    assert select_keys(conn, 'assignee = null') == ['RA-2']
+    assert select_keys(conn, 'resolved != null') == ['PTB-1', 'RA-10']
+
+
+def test_not_equal_does_not_match_empty(conn):
+    """Like JQL, '!=' does not match the issues where the field is empty."""
+    assert select_keys(conn, 'assignee != jsundaram') == ['PTB-1']
+
+
+def test_dates(conn):
+    """Dates are normalized to the layout of the stored timestamps."""
+    assert select_keys(conn, 'resolved >= 2023/3/2 AND resolved <= 2023-03-06') == ['RA-10']
+    assert select_keys(conn, 'updated > "2023-03-04 8:59"') == ['PTB-1', 'RA-9']
+
+    _, _, params = to_sql('updated < "2023/3/5 9:05"')
+    assert params == ['2023-03-05T09:05']
+
+
+def test_default_order_is_by_key_number(conn):
+    """Issue keys sort by project and then by number, so RA-9 comes before RA-10."""
+    assert select_keys(conn, '') == ['PTB-1', 'RA-2', 'RA-9', 'RA-10']
+
+
+def test_order_by(conn):
+    """'ORDER BY key' sorts numerically and other columns sort as they are."""
+    assert select_keys(conn, 'project = RA ORDER BY key DESC') == ['RA-10', 'RA-9', 'RA-2']
+    assert select_keys(conn, 'project = RA ORDER BY updated DESC, key') == ['RA-9', 'RA-10', 'RA-2']
+    assert select_keys(conn, 'ORDER BY status, key') == ['PTB-1', 'RA-10', 'RA-9', 'RA-2']
+
+
+@pytest.mark.parametrize('query', [
+    'summary ~ foo',
+    'text ~ "release"',
+    'assignee = currentUser()',
+    'status not in (Done)',
+    'NOT status = Done',
+    'resolved >= -7d',
+    'resolved >= startOfWeek()',
+    'assignee in (EMPTY, jsundaram)',
+    'resolved > EMPTY',
+    'project = RA ORDER status',
+    '(project = RA',
+    'project = RA status = Done',
+])
+def test_unsupported(query):
+    """Queries the mirror cannot evaluate raise so that they can be sent to the server."""
+    with pytest.raises(UnsupportedQueryError):
+        to_sql(query)
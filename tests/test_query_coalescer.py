@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Tests for `jira_python_utils.query_coalescer`."""
+import re
+
+from types import SimpleNamespace
+
+import pytest
+
+from jira_python_utils.query_coalescer import parse_epic_query, search_epic_queries
+
+
+class Page(list):
+    """A page of search results with the total that Jira reports."""
+
+    total = 0
+
+
+class FakeJira:
+    """Answer each search with one issue per epic in its 'Epic Link' clause."""
+
+    def __init__(self, has_epic_link_field=True):
+        self.has_epic_link_field = has_epic_link_field
+        self.queries = []
+
+    def fields(self):
+        if self.has_epic_link_field:
+            return [{'name': 'Sprint', 'id': 'customfield_1'}, {'name': 'Epic Link', 'id': 'customfield_2'}]
+        return [{'name': 'Sprint', 'id': 'customfield_1'}]
+
+    def search_issues(self, query, startAt, maxResults, fields):
+        self.queries.append(query)
+        match = re.search(r'"Epic Link" (?:in \(([^)]*)\)|= (\S+))', query)
+        epic_keys = [] if match is None else (match.group(1) or match.group(2)).split(', ')
+        page = Page(
+            SimpleNamespace(key=f'{epic_key}-issue', fields=SimpleNamespace(customfield_2=epic_key))
+            for epic_key in epic_keys
+        )
+        page.total = len(page)
+        return page
+
+
+def get_keys(results):
+    return [[issue.key for issue in issues] for issues in results]
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('"Epic Link" = RA-118', ('RA-118', '')),
+    ('"epic link" = ra-118', ('RA-118', '')),
+    ('"Epic Link" = RGCCIDM-118 AND assignee in (jsundaram)', ('RGCCIDM-118', 'assignee in (jsundaram)')),
+    ('  "Epic Link"=PTB-264 and status = Done  ', ('PTB-264', 'status = Done')),
+])
+def test_parse_epic_query(query, expected):
+    """A per-epic query splits into the epic key and the rest of its clauses."""
+    assert parse_epic_query(query) == expected
+
+
+@pytest.mark.parametrize('query', [
+    '"Epic Link" = RA-118 OR assignee in (jsundaram)',
+    '"Epic Link" = RA-118 AND status = Done or status = "To Do"',
+    '"Epic Link" = RA-118 AND (status = Done OR status = "To Do")',
+])
+def test_parse_epic_query_rejects_or(query):
+    """An OR would bind differently once the epic clause becomes an 'in' list."""
+    assert parse_epic_query(query) is None
+
+
+@pytest.mark.parametrize('query', [
+    'project = RA',
+    '"Epic Link" in (RA-1, RA-2)',
+    'assignee in (jsundaram) AND "Epic Link" = RA-118',
+    '"Epic Link" = RA-118 ORDER',
+])
+def test_parse_epic_query_rejects_other_queries(query):
+    """Queries that are not of the form '"Epic Link" = KEY [AND ...]' are run as they are."""
+    assert parse_epic_query(query) is None
+
+
+def test_search_epic_queries_combines_per_epic_queries():
+    """Per-epic queries with the same remaining clauses run as chunked 'in' searches and come back in query order."""
+    auth_jira = FakeJira()
+    queries = [
+        '"Epic Link" = RA-1 AND status = Done',
+        '"Epic Link" = RA-2 AND status = Done',
+        'project = RA',
+        '"Epic Link" = RA-3 AND status = Done',
+        '"Epic Link" = RA-1 AND status = Done',
+        '"Epic Link" = RA-4',
+    ]
+
+    results = search_epic_queries(auth_jira, queries, max_workers=2, chunk_size=2)
+
+    assert get_keys(results) == [['RA-1-issue'], ['RA-2-issue'], [], ['RA-3-issue'], ['RA-1-issue'], ['RA-4-issue']]
+    assert sorted(auth_jira.queries) == sorted([
+        '"Epic Link" in (RA-1, RA-2) AND status = Done',
+        '"Epic Link" in (RA-3) AND status = Done',
+        'project = RA',
+        '"Epic Link" = RA-4',
+    ])
+
+
+def test_search_epic_queries_without_epic_link_field():
+    """Without an epic link field every query runs as it is."""
+    auth_jira = FakeJira(has_epic_link_field=False)
+    queries = ['"Epic Link" = RA-1', '"Epic Link" = RA-2']
+
+    assert get_keys(search_epic_queries(auth_jira, queries, max_workers=1)) == [['RA-1-issue'], ['RA-2-issue']]
+    assert auth_jira.queries == queries